@@ -0,0 +1,200 @@
+"""Write-behind buffers for hot-path counters.
+
+Search analytics and vehicle view counts used to be written on the request
+path (``get_or_create`` plus an ``UPDATE``), taking SQLite's write lock on
+every search or detail view. They are now counted in memory and a background
+thread merges them into the database in one batch every flush interval, or
+sooner once enough events are pending. A crash loses at most one interval of
+counts.
+"""
+import atexit
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .background import run_task
+from .caching import bump_view_counts_version
+from .models import SearchAnalytics, VehicleMetadata
+
+QUERY_MAX_LENGTH = SearchAnalytics._meta.get_field('query').max_length
+
+# Rows per upsert statement, well under SQLite's bound parameter limit
+UPSERT_BATCH_SIZE = 300
+
+
+class CounterBuffer(ABC):
+    """Counts events per key in memory and hands them to ``write()`` in batches.
+
+    Subclasses set the settings names for the flush interval and size and
+    implement ``write(counts, last_seen)``.
+    """
+    name = 'counter'
+    interval_setting = None
+    size_setting = None
+    default_interval = 5
+    default_size = 200
+
+    def __init__(self, flush_interval=None, flush_size=None):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._counts = Counter()
+        self._last_seen = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def get_flush_interval(self):
+        if self.flush_interval is not None:
+            return self.flush_interval
+        return getattr(settings, self.interval_setting, self.default_interval)
+
+    def get_flush_size(self):
+        if self.flush_size is not None:
+            return self.flush_size
+        return getattr(settings, self.size_setting, self.default_size)
+
+    def add(self, key):
+        """Count one event. Never touches the database."""
+        with self._lock:
+            self._counts[key] += 1
+            self._last_seen[key] = timezone.now()
+            self._pending += 1
+            full = self._pending >= self.get_flush_size()
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write pending counts to the database. Returns the number of keys written."""
+        with self._lock:
+            counts, last_seen = self._counts, self._last_seen
+            self._counts, self._last_seen, self._pending = Counter(), {}, 0
+        if not counts:
+            return 0
+        try:
+            self.write(counts, last_seen)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for key, count in counts.items():
+                    self._counts[key] += count
+                    self._last_seen[key] = max(last_seen[key], self._last_seen.get(key, last_seen[key]))
+                    self._pending += count
+            raise
+        return len(counts)
+
+    @abstractmethod
+    def write(self, counts, last_seen):
+        """Merge ``counts`` (key -> events) into the database. ``last_seen`` maps key -> latest event time."""
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.get_flush_interval())
+            self._wakeup.clear()
+            # A failed flush keeps its counts for the next attempt
+            run_task(f'Flushing {self.name} counts', self.flush)
+
+
+class SearchAnalyticsBuffer(CounterBuffer):
+    name = 'search-analytics'
+    interval_setting = 'SEARCH_ANALYTICS_FLUSH_INTERVAL'
+    size_setting = 'SEARCH_ANALYTICS_FLUSH_SIZE'
+
+    def record(self, query):
+        query = query.strip().lower()[:QUERY_MAX_LENGTH]
+        if query:
+            self.add(query)
+
+    def write(self, counts, last_seen):
+        upsert_search_counts([(query, count, last_seen[query]) for query, count in counts.items()])
+
+
+class ViewCountBuffer(CounterBuffer):
+    name = 'view-count'
+    interval_setting = 'VIEW_COUNT_FLUSH_INTERVAL'
+    size_setting = 'VIEW_COUNT_FLUSH_SIZE'
+    default_size = 500
+
+    def record(self, vehicle_id):
+        self.add(vehicle_id)
+
+    def write(self, counts, last_seen):
+        merge_view_counts(counts)
+
+
+def upsert_search_counts(rows):
+    """Add ``(query, count, last_searched)`` rows onto SearchAnalytics in one batch."""
+    if connection.vendor in ('sqlite', 'postgresql'):
+        table = connection.ops.quote_name(SearchAnalytics._meta.db_table)
+        count = connection.ops.quote_name('count')
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                batch = rows[start:start + UPSERT_BATCH_SIZE]
+                placeholders = ', '.join(['(%s, %s, %s)'] * len(batch))
+                params = []
+                for query, delta, seen in batch:
+                    params += [query, delta, connection.ops.adapt_datetimefield_value(seen)]
+                cursor.execute(
+                    f'INSERT INTO {table} (query, {count}, last_searched) VALUES {placeholders} '
+                    f'ON CONFLICT (query) DO UPDATE SET {count} = {table}.{count} + excluded.{count}, '
+                    f'last_searched = excluded.last_searched',
+                    params,
+                )
+        return
+
+    with transaction.atomic():
+        for query, delta, seen in rows:
+            updated = SearchAnalytics.objects.filter(query=query).update(count=F('count') + delta, last_searched=seen)
+            if not updated:
+                SearchAnalytics.objects.create(query=query, count=delta)
+
+
+def merge_view_counts(counts):
+    """Add ``{vehicle_id: views}`` onto ``VehicleMetadata.views_count`` with one UPDATE per batch."""
+    from .pricing import refresh_vehicle_prices
+
+    vehicle_ids = list(counts)
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(vehicle_ids), UPSERT_BATCH_SIZE):
+            batch = vehicle_ids[start:start + UPSERT_BATCH_SIZE]
+            existing = set(VehicleMetadata.objects.filter(vehicle_id__in=batch).values_list('vehicle_id', flat=True))
+            missing = [vehicle_id for vehicle_id in batch if vehicle_id not in existing]
+            if missing:
+                # Creates the metadata rows (with their stored price) for first-time views
+                refresh_vehicle_prices(missing)
+            updated += VehicleMetadata.objects.filter(vehicle_id__in=batch).update(views_count=F('views_count') + Case(
+                *[When(vehicle_id=vehicle_id, then=Value(counts[vehicle_id])) for vehicle_id in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+        if updated:
+            # update() sends no signals; re-sort cached pages ordered by views
+            transaction.on_commit(bump_view_counts_version)
+
+
+search_analytics_buffer = SearchAnalyticsBuffer()
+view_count_buffer = ViewCountBuffer()
+
+
+def _flush_at_exit():
+    for buffer in (search_analytics_buffer, view_count_buffer):
+        run_task(f'Flushing {buffer.name} counts at exit', buffer.flush)
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,30 @@
+"""Running work off the request thread.
+
+Image variants, remote downloads, import jobs, chat summaries, dashboard
+recounts and the counter buffers all run in thread pools or worker
+threads. ``run_task`` is the one wrapper they share. It logs a failure with
+its traceback instead of letting it vanish inside a future, and it closes
+the thread's database connections afterwards, since Django only does that
+for request threads.
+"""
+import logging
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def run_task(description, func, *args, **kwargs):
+    """Call ``func``; log and swallow any exception. Returns the result or None."""
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('%s failed', description)
+        return None
+    finally:
+        connections.close_all()
+
+
+def submit_task(executor, description, func, *args, **kwargs):
+    """Run ``func`` through ``run_task`` on ``executor``."""
+    return executor.submit(run_task, description, func, *args, **kwargs)
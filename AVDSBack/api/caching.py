@@ -0,0 +1,168 @@
+"""Cache helpers for read-heavy catalog endpoints.
+
+Cached entries embed a catalog version in their key. Signal handlers bump the
+version whenever vehicles or reference data change, which orphans every
+older entry at once without having to track individual keys. Changes that
+only touch one vehicle's content bump that vehicle's version instead.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, timeout=None)
+
+
+def make_key(prefix, parts):
+    """Build a short, stable cache key from JSON-serialisable ``parts``."""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'{prefix}:{catalog_version()}:{digest}'
+
+
+# Per-vehicle versions let a cached page be invalidated by changes to just the
+# vehicles it contains (new images, reviews) without flushing every page.
+
+def _vehicle_version_key(vehicle_id):
+    return f'vehicle:version:{vehicle_id}'
+
+
+def vehicle_versions(vehicle_ids):
+    """Current version token for each vehicle, creating tokens that are missing."""
+    keys = {_vehicle_version_key(vehicle_id): vehicle_id for vehicle_id in vehicle_ids}
+    found = cache.get_many(keys.keys())
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, token in missing.items():
+        cache.add(key, token, timeout=None)
+    if missing:
+        found.update(cache.get_many(missing.keys()))
+    return {str(keys[key]): token for key, token in found.items()}
+
+
+def versions_match(versions):
+    """Whether none of the vehicles in a ``vehicle_versions()`` snapshot changed since."""
+    keys = {_vehicle_version_key(vehicle_id): token for vehicle_id, token in versions.items()}
+    return cache.get_many(keys.keys()) == keys
+
+
+def vehicle_version(vehicle_id):
+    return vehicle_versions([vehicle_id])[str(vehicle_id)]
+
+
+def bump_vehicle_version(vehicle_id):
+    # A fresh token rather than incr(): an evicted key can never look unchanged
+    cache.set(_vehicle_version_key(vehicle_id), time.time_ns(), timeout=None)
+
+
+# Per-table versions back the ETags of the reference data endpoints
+
+def _table_version_key(model):
+    return f'table:version:{model._meta.label_lower}'
+
+
+def table_versions(models):
+    keys = [_table_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump_table_version(model):
+    cache.set(_table_version_key(model), time.time_ns(), timeout=None)
+
+
+# View counts are merged in batches with QuerySet.update(), which sends no
+# signals, so the merge bumps this version instead; only pages sorted by
+# views include it in their key
+
+VIEW_COUNTS_VERSION_KEY = 'views:version'
+
+
+def view_counts_version():
+    version = cache.get(VIEW_COUNTS_VERSION_KEY)
+    if version is None:
+        cache.add(VIEW_COUNTS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VIEW_COUNTS_VERSION_KEY)
+    return version
+
+
+def bump_view_counts_version():
+    cache.set(VIEW_COUNTS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+class ResponseCache:
+    """Cached response payloads for one endpoint, with hit and miss counters.
+
+    Entries are stored under a catalog-versioned key together with the
+    versions of the vehicles they contain, and are treated as a miss once
+    either moves on. ``alias`` selects the Django cache that holds the
+    entries, so an endpoint can get its own size bound and default timeout;
+    the counters always live in the default cache.
+    """
+
+    def __init__(self, name, timeout=300, alias='default'):
+        self.name = name
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key_for(self, parts):
+        return make_key(f'response:{self.name}', parts)
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is not None and versions_match(entry['versions']):
+            self._count('hits')
+            return entry['data']
+        self._count('misses')
+        return None
+
+    def set(self, key, data, vehicle_ids=()):
+        self.cache.set(key, {'data': data, 'versions': vehicle_versions(vehicle_ids)}, self.timeout)
+
+    def stats(self):
+        counters = cache.get_many([self._counter_key('hits'), self._counter_key('misses')])
+        return {
+            'hits': counters.get(self._counter_key('hits'), 0),
+            'misses': counters.get(self._counter_key('misses'), 0),
+        }
+
+    def _counter_key(self, counter):
+        return f'stats:{self.name}:{counter}'
+
+    def _count(self, counter):
+        key = self._counter_key(counter)
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+
+vehicle_list_cache = ResponseCache('vehicle_list')
+
+# Chat replies use the 'chat' cache: its TIMEOUT is the TTL and it evicts the
+# least recently used reply once MAX_ENTRIES is reached (see settings.CACHES)
+chat_response_cache = ResponseCache('chat', timeout=DEFAULT_TIMEOUT, alias='chat')
@@ -0,0 +1,179 @@
+"""Precomputed reference catalog snapshot.
+
+The whole reference catalog (makes with their models, bodies and drive
+types) is rendered into one compact JSON document plus a gzipped copy, both
+written to ``CATALOG_SNAPSHOT_DIR``. ``GET /api/catalog/`` serves those bytes
+as is, so app start needs one cacheable request instead of one per make.
+
+The snapshot version is a hash of its content and doubles as the ETag. It is
+regenerated by ``python manage.py build_catalog_snapshot``, after CSV imports
+that add makes or models, and lazily whenever the table versions of the
+reference models move (see api/caching.py). Table versions live in a
+per-process cache, so the files are stored with a fingerprint of the
+reference tables instead (row counts, highest ids, name lengths; one query).
+A new process serves the files on disk while that fingerprint still matches.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .caching import table_versions
+from .models import Body, DriveType, Make, MakeModel
+
+SNAPSHOT_MODELS = (Make, MakeModel, Body, DriveType)
+SNAPSHOT_NAME = 'catalog.json'
+# Fingerprint the snapshot was built from, kept out of the served document
+SNAPSHOT_META_NAME = 'catalog.meta.json'
+
+# Columns summed into the fingerprint: text by length, ids by value
+FINGERPRINT_COLUMNS = {
+    Make: ('make_name',),
+    MakeModel: ('model_name', 'make_id'),
+    Body: ('body_name',),
+    DriveType: ('drive_type_name',),
+}
+
+
+@dataclass
+class CatalogSnapshot:
+    version: str
+    body: bytes
+    gzipped: bytes
+    table_versions: list
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def snapshot_dir():
+    return getattr(settings, 'CATALOG_SNAPSHOT_DIR', os.path.join(settings.MEDIA_ROOT, 'catalog'))
+
+
+def render_catalog():
+    """Build the catalog document from the database (four queries)."""
+    models_by_make = {}
+    for model_id, make_id, model_name in MakeModel.objects.order_by('model_name').values_list(
+            'model_id', 'make_id', 'model_name'):
+        models_by_make.setdefault(make_id, []).append({'id': model_id, 'name': model_name})
+
+    makes = [
+        {'id': make_id, 'name': make_name, 'models': models_by_make.get(make_id, [])}
+        for make_id, make_name in Make.objects.order_by('make_name').values_list('make_id', 'make_name')
+    ]
+    bodies = [
+        {'id': body_id, 'name': body_name}
+        for body_id, body_name in Body.objects.order_by('body_name').values_list('body_id', 'body_name')
+    ]
+    drive_types = [
+        {'id': drive_type_id, 'name': drive_type_name}
+        for drive_type_id, drive_type_name in DriveType.objects.order_by('drive_type_name').values_list(
+            'drive_type_id', 'drive_type_name')
+    ]
+    return {'makes': makes, 'bodies': bodies, 'drive_types': drive_types}
+
+
+def catalog_fingerprint():
+    """Per-table row count, highest id and column sums of the reference tables.
+
+    Unlike the cached table versions this is the same in every process, so
+    it tells whether a snapshot written by another process is still current.
+    """
+    quote = connection.ops.quote_name
+    width = max(len(columns) for columns in FINGERPRINT_COLUMNS.values())
+    selects = []
+    for model in SNAPSHOT_MODELS:
+        sums = []
+        for name in FINGERPRINT_COLUMNS[model]:
+            field = model._meta.get_field(name)
+            column = quote(field.column)
+            sums.append(f'SUM(LENGTH({column}))' if field.get_internal_type() == 'CharField' else f'SUM({column})')
+        selects.append(
+            f'SELECT COUNT(*), MAX({quote(model._meta.pk.column)}), {", ".join(sums)}'
+            f'{", NULL" * (width - len(sums))} FROM {quote(model._meta.db_table)}'
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(selects))
+        return [list(row) for row in cursor.fetchall()]
+
+
+def _write_atomic(directory, target, data):
+    # A uniquely named temp file and a rename, so readers never see a half-written
+    # file and concurrent writers never interleave
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.' + os.path.basename(target), suffix='.tmp',
+                                     delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, target)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+
+def build_snapshot():
+    """Render, version and write the snapshot files. Returns the new snapshot."""
+    global _current
+    versions = table_versions(SNAPSHOT_MODELS)
+    fingerprint = catalog_fingerprint()
+    catalog = render_catalog()
+    content = json.dumps(catalog, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+    version = hashlib.sha1(content).hexdigest()[:16]
+
+    document = {'version': version, 'generated_at': timezone.now().isoformat(), **catalog}
+    body = json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+
+    directory = snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    meta = json.dumps({'version': version, 'fingerprint': fingerprint}).encode('utf-8')
+    # The metadata goes last: a snapshot is only trusted once all three files match
+    for target, data in ((path, body), (path + '.gz', gzipped), (os.path.join(directory, SNAPSHOT_META_NAME), meta)):
+        _write_atomic(directory, target, data)
+
+    snapshot = CatalogSnapshot(version, body, gzipped, versions)
+    with _lock:
+        _current = snapshot
+    return snapshot
+
+
+def _load_snapshot():
+    directory = snapshot_dir()
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    try:
+        with open(path, 'rb') as f:
+            body = f.read()
+        with open(path + '.gz', 'rb') as f:
+            gzipped = f.read()
+        with open(os.path.join(directory, SNAPSHOT_META_NAME), 'rb') as f:
+            meta = json.loads(f.read())
+        version = json.loads(body)['version']
+    except (OSError, ValueError, KeyError):
+        return None
+    # Trust the files only if they were built from the tables as they stand now
+    if meta.get('version') != version or meta.get('fingerprint') != catalog_fingerprint():
+        return None
+    return CatalogSnapshot(version, body, gzipped, table_versions(SNAPSHOT_MODELS))
+
+
+def get_snapshot():
+    """Current snapshot, loading it from disk or rebuilding it when the catalog moved on."""
+    global _current
+    with _lock:
+        snapshot = _current
+    if snapshot is None:
+        snapshot = _load_snapshot()
+        if snapshot is not None:
+            with _lock:
+                _current = snapshot
+    if snapshot is None or snapshot.table_versions != table_versions(SNAPSHOT_MODELS):
+        snapshot = build_snapshot()
+    return snapshot
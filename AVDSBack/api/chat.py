@@ -0,0 +1,299 @@
+"""Chat request handling shared by the sync and async chat views.
+
+``prepare_chat`` does everything before the LLM call: the session and its
+windowed history, catalog grounding, prompt assembly and the response cache
+lookup. ``complete_chat`` does everything after it: cache store, session
+turns and the response body. Both are synchronous and touch the database;
+``AsyncChatView`` runs them with ``sync_to_async`` and only awaits the LLM.
+
+``chat_limiter`` bounds the async view per worker process: at most
+``CHAT_MAX_IN_FLIGHT`` LLM calls run at once and up to ``CHAT_MAX_QUEUE``
+more wait for a slot. A full queue is refused with 429, and a wait longer
+than ``CHAT_QUEUE_TIMEOUT`` ends in 503. Both carry ``Retry-After``.
+"""
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
+
+from .caching import chat_response_cache
+from .chat_sessions import record_turns, session_history
+from .llm import LLMError, sse_event
+from .models import ChatSession
+from .prompts import AssembledPrompt, build_generate_prompt, build_messages, cache_parts
+from .retrieval import CatalogContext, build_catalog_context
+
+
+class ChatRequestError(Exception):
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def is_true(value):
+    return str(value).lower() in ('1', 'true')
+
+
+def is_false(value):
+    return str(value).lower() in ('0', 'false')
+
+
+@dataclass
+class PreparedChat:
+    user_message: str
+    context: Any
+    history: List[dict]
+    prompt: AssembledPrompt
+    catalog: Optional[CatalogContext] = None
+    session: Optional[ChatSession] = None
+    cache_key: Optional[str] = None
+    cached: Optional[str] = None
+    stream: bool = False
+
+    @property
+    def messages(self):
+        return self.prompt.messages
+
+    def generate_prompt(self):
+        """Flat prompt for the /api/generate fallback."""
+        return build_generate_prompt(
+            self.user_message, self.history, self.context, self.catalog.text if self.catalog else None
+        )
+
+    def headers(self):
+        headers = {
+            'Server-Timing': f'prompt;dur={self.prompt.elapsed_ms:.3f}',
+            'X-Prompt-Size': str(self.prompt.chars),
+        }
+        if self.cache_key:
+            headers['X-Cache'] = 'HIT' if self.cached is not None else 'MISS'
+        if self.catalog:
+            headers['X-Catalog-Matches'] = ','.join(str(pk) for pk in self.catalog.vehicle_ids)
+        return headers
+
+
+def get_session(data, user):
+    user = user if user is not None and user.is_authenticated else None
+    session_id = data.get('session_id')
+    if not session_id:
+        return ChatSession.objects.create(user=user)
+    try:
+        session = ChatSession.objects.get(pk=session_id)
+    except (ChatSession.DoesNotExist, ValueError, ValidationError):
+        return None
+    # Sessions started by a signed-in user are private to that user
+    if session.user_id and (user is None or session.user_id != user.pk):
+        return None
+    return session
+
+
+def prepare_chat(data, params, user, meta, model):
+    """Build the prompt for one chat request. Raises ChatRequestError for bad requests."""
+    user_message = data.get('message')
+    context = data.get('context', {})
+    history = data.get('history', [])
+
+    if not user_message:
+        raise ChatRequestError('Message is required', 400)
+
+    # Server-held sessions replace the client's history (see api/chat_sessions.py)
+    session = None
+    if data.get('session_id') or is_true(data.get('session', '')):
+        session = get_session(data, user)
+        if session is None:
+            raise ChatRequestError('Chat session not found', 404)
+        history = session_history(session)
+
+    # Vehicles from the catalog that match the message (see api/retrieval.py);
+    # opt out per request with "catalog": false
+    catalog = None
+    if getattr(settings, 'CHAT_CATALOG_CONTEXT', True) and not is_false(data.get('catalog', '')):
+        catalog = build_catalog_context(user_message)
+
+    # Cached system prompt plus this request's turns (see api/prompts.py)
+    prompt = build_messages(user_message, history, context, catalog.text if catalog else None)
+
+    chat = PreparedChat(
+        user_message=user_message, context=context, history=history, prompt=prompt,
+        catalog=catalog, session=session,
+        stream=is_true(data.get('stream', params.get('stream', ''))),
+    )
+
+    # Repeated questions are answered from the response cache unless the request
+    # opts out with "cache": false or Cache-Control: no-cache
+    if not is_false(data.get('cache', '')) and 'no-cache' not in meta.get('HTTP_CACHE_CONTROL', ''):
+        chat.cache_key = chat_response_cache.key_for(
+            [model] + cache_parts(prompt, user_message, history, context, catalog.text if catalog else None)
+        )
+        chat.cached = chat_response_cache.get(chat.cache_key)
+    return chat
+
+
+def complete_chat(chat, ai_content, from_cache=False):
+    """Store the reply (cache, session turns) and return the response body."""
+    if chat.cache_key and not from_cache:
+        chat_response_cache.set(chat.cache_key, ai_content)
+    data = {'response': ai_content}
+    if chat.session:
+        record_turns(chat.session, chat.user_message, ai_content)
+        data['session_id'] = str(chat.session.pk)
+    return data
+
+
+def stream_events(chat, tokens):
+    """Server-sent events for a reply streamed from the ``tokens`` iterator."""
+    if chat.cached is not None:
+        yield sse_event({'token': chat.cached})
+        yield sse_event(complete_chat(chat, chat.cached, from_cache=True), event='done')
+        return
+    parts = []
+    try:
+        for token in tokens():
+            parts.append(token)
+            yield sse_event({'token': token})
+    except LLMError as e:
+        yield sse_event({'error': str(e)}, event='error')
+        return
+    yield sse_event(complete_chat(chat, ''.join(parts)), event='done')
+
+
+async def astream_events(chat, tokens, on_close=None):
+    """Async ``stream_events``; ``on_close`` runs as soon as a started stream ends."""
+    try:
+        if chat.cached is not None:
+            yield sse_event({'token': chat.cached})
+            done = await sync_to_async(complete_chat)(chat, chat.cached, from_cache=True)
+            yield sse_event(done, event='done')
+            return
+        parts = []
+        try:
+            async for token in tokens():
+                parts.append(token)
+                yield sse_event({'token': token})
+        except LLMError as e:
+            yield sse_event({'error': str(e)}, event='error')
+            return
+        done = await sync_to_async(complete_chat)(chat, ''.join(parts))
+        yield sse_event(done, event='done')
+    finally:
+        if on_close:
+            on_close()
+
+
+class ClosingEvents:
+    """Async event iterator whose ``close()`` runs ``on_close``.
+
+    StreamingHttpResponse.close() calls ``close()`` on its content, but never
+    ``aclose()``, and an async generator closed before its first item skips
+    its ``finally`` block anyway.
+    """
+
+    def __init__(self, events, on_close):
+        self.events = events
+        self.on_close = on_close
+
+    def __aiter__(self):
+        return self.events.__aiter__()
+
+    def close(self):
+        self.on_close()
+
+
+def event_stream_response(events, on_close=None):
+    """Server-sent events response; ``on_close`` runs when the server closes it."""
+    if on_close:
+        events = ClosingEvents(events, on_close)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class ChatLimiter:
+    """In-flight cap and bounded wait queue for LLM calls, one per event loop."""
+
+    def __init__(self, max_in_flight=None, max_queue=None, queue_timeout=None, retry_after=None):
+        self._max_in_flight = max_in_flight
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._retry_after = retry_after
+        # asyncio primitives are bound to the loop they are used on
+        self._states = weakref.WeakKeyDictionary()
+
+    @property
+    def max_in_flight(self):
+        return self._max_in_flight or getattr(settings, 'CHAT_MAX_IN_FLIGHT', 8)
+
+    @property
+    def max_queue(self):
+        return self._max_queue if self._max_queue is not None else getattr(settings, 'CHAT_MAX_QUEUE', 32)
+
+    @property
+    def queue_timeout(self):
+        return self._queue_timeout or getattr(settings, 'CHAT_QUEUE_TIMEOUT', 10)
+
+    @property
+    def retry_after(self):
+        return self._retry_after or getattr(settings, 'CHAT_RETRY_AFTER', 5)
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = {'semaphore': asyncio.Semaphore(self.max_in_flight), 'in_flight': 0, 'waiting': 0}
+        return state
+
+    async def acquire(self):
+        """Wait for a slot and return a callable that frees it.
+
+        Raises ChatRequestError (429 or 503) when the worker is overloaded.
+        """
+        state = self._state()
+        semaphore = state['semaphore']
+        if semaphore.locked() and state['waiting'] >= self.max_queue:
+            raise ChatRequestError('Too many chat requests', 429, retry_after=self.retry_after)
+        state['waiting'] += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ChatRequestError('AI Service busy', 503, retry_after=self.retry_after)
+        finally:
+            state['waiting'] -= 1
+        state['in_flight'] += 1
+
+        loop = asyncio.get_running_loop()
+        released = False
+        released_lock = threading.Lock()
+
+        def free():
+            state['in_flight'] -= 1
+            semaphore.release()
+
+        def release():
+            nonlocal released
+            with released_lock:
+                if released:
+                    return
+                released = True
+            # Django closes responses in a worker thread, and asyncio primitives
+            # may only be touched from their own loop
+            try:
+                on_loop = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                on_loop = False
+            if on_loop:
+                free()
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(free)
+        return release
+
+
+chat_limiter = ChatLimiter()
@@ -0,0 +1,147 @@
+"""Server-side chat sessions with a bounded prompt history.
+
+Clients send only the new message and a ``session_id``. Turns are stored in
+``ChatTurn``, and each prompt gets the session's rolling summary plus the
+most recent turns that fit in ``CHAT_HISTORY_TOKENS``. Turns that slide out
+of that window are folded into the summary by a background worker, which
+asks the LLM for a summary capped at ``CHAT_SUMMARY_TOKENS``. If the LLM is
+unavailable, the worker falls back to a truncated transcript. Until the
+summary catches up, those turns are simply left out. In both cases the
+prompt stays the same size however long the conversation runs.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .background import submit_task
+from .llm import LLMError, ollama_client
+from .models import ChatSession, ChatTurn
+from .prompts import estimate_tokens
+
+# Turns read back per request; the token window is always much smaller
+MAX_WINDOW_TURNS = 100
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below between a car buyer and a vehicle catalog "
+    "assistant in at most {words} words. Keep the user's preferences, budget, "
+    "vehicles discussed and any open questions. Reply with the summary only."
+)
+
+_executor = None
+_queued = set()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-summaries')
+    return _executor
+
+
+def history_budget():
+    return getattr(settings, 'CHAT_HISTORY_TOKENS', 1500)
+
+
+def summary_budget():
+    return getattr(settings, 'CHAT_SUMMARY_TOKENS', 300)
+
+
+def session_history(session):
+    """Summary plus the newest turns within the token budget, as chat messages.
+
+    Queues a summary update when unsummarized turns fall outside the window.
+    """
+    budget = history_budget()
+    history = []
+    if session.summary:
+        history.append({'role': 'system', 'content': f"Summary of the earlier conversation: {session.summary}"})
+        budget -= estimate_tokens(history[0]['content'])
+
+    turns = list(
+        session.turns.filter(id__gt=session.summarized_through)
+        .order_by('-id').values_list('id', 'role', 'content', 'tokens')[:MAX_WINDOW_TURNS]
+    )
+    window = []
+    overflow = False
+    for turn_id, role, content, tokens in turns:
+        if tokens > budget:
+            overflow = True
+            break
+        window.append({'role': role, 'content': content})
+        budget -= tokens
+    if overflow or len(turns) == MAX_WINDOW_TURNS:
+        queue_summary(session.pk)
+    history.extend(reversed(window))
+    return history
+
+
+def record_turns(session, user_message, reply):
+    ChatTurn.objects.bulk_create([
+        ChatTurn(session=session, role='user', content=user_message, tokens=estimate_tokens(user_message)),
+        ChatTurn(session=session, role='assistant', content=reply, tokens=estimate_tokens(reply)),
+    ])
+    ChatSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+
+
+def queue_summary(session_id):
+    if session_id in _queued:
+        return
+    _queued.add(session_id)
+    # On failure the turns stay unsummarized and are retried on the next overflow
+    transaction.on_commit(lambda: submit_task(
+        get_executor(), f'Summarizing chat session {session_id}', _summarize_queued, session_id
+    ))
+
+
+def _summarize_queued(session_id):
+    try:
+        return summarize_session(session_id)
+    finally:
+        _queued.discard(session_id)
+
+
+def summarize_session(session_id):
+    """Fold the turns that no longer fit in the window into the rolling summary."""
+    session = ChatSession.objects.get(pk=session_id)
+    turns = list(session.turns.filter(id__gt=session.summarized_through).order_by('-id'))
+
+    # Keep the newest turns that fit in half the budget verbatim; fold the rest
+    keep_budget = history_budget() // 2
+    kept = 0
+    fold_from = len(turns)
+    for index, turn in enumerate(turns):
+        if kept + turn.tokens > keep_budget:
+            fold_from = index
+            break
+        kept += turn.tokens
+    to_fold = list(reversed(turns[fold_from:]))
+    if not to_fold:
+        return session
+
+    summary = build_summary(session.summary, to_fold)
+    # Only apply if no other worker moved the summary on in the meantime
+    ChatSession.objects.filter(pk=session.pk, summarized_through=session.summarized_through).update(
+        summary=summary, summarized_through=to_fold[-1].id
+    )
+    session.refresh_from_db()
+    return session
+
+
+def build_summary(previous, turns):
+    max_chars = summary_budget() * 4
+    transcript = '\n'.join(f"{turn.role.capitalize()}: {turn.content}" for turn in turns)
+    if previous:
+        transcript = f"Earlier summary: {previous}\n\n{transcript}"
+    try:
+        summary = ollama_client.chat([
+            {'role': 'system', 'content': SUMMARY_INSTRUCTIONS.format(words=summary_budget() * 3 // 4)},
+            {'role': 'user', 'content': transcript},
+        ]).strip()
+    except LLMError:
+        summary = ''
+    if not summary:
+        # No LLM: keep the most recent part of the transcript
+        summary = transcript[-max_chars:]
+    return summary[:max_chars]
@@ -0,0 +1,77 @@
+"""Streaming export of the filtered vehicle catalog as CSV or NDJSON.
+
+Rows are read with ``QuerySet.iterator()``, which uses a server-side cursor
+where the database supports one and fetches ``EXPORT_CHUNK_SIZE`` rows at a
+time otherwise, and are encoded and yielded a chunk at a time. Memory use
+therefore stays flat however many vehicles are exported. The CSV columns are
+a superset of the upload template, so an export can be re-imported.
+"""
+import csv
+import json
+
+from django.db.models import OuterRef, Subquery
+
+from .filters import filter_vehicles
+from .models import VehicleDetail, VehicleImage
+
+# Rows fetched from the database, and encoded per yielded chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# (column, queryset lookup)
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('make', 'make__make_name'),
+    ('model', 'model__model_name'),
+    ('year', 'year'),
+    ('price', 'metadata__price'),
+    ('engine', 'engine'),
+    ('engine_cc', 'engine_cc'),
+    ('body', 'body__body_name'),
+    ('drive_type', 'drive_type__drive_type_name'),
+    ('vehicle_display_name', 'vehicle_display_name'),
+    ('image_url', 'primary_image_url'),
+]
+
+EXPORT_COLUMNS = [column for column, _ in EXPORT_FIELDS]
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(params):
+    primary_image = VehicleImage.objects.filter(
+        vehicle_id=OuterRef('pk'), is_primary=True, image_url__isnull=False
+    ).order_by('id').values('image_url')[:1]
+    queryset = VehicleDetail.objects.annotate(primary_image_url=Subquery(primary_image))
+    queryset = filter_vehicles(queryset, params)
+    return queryset.order_by('id').values_list(*[lookup for _, lookup in EXPORT_FIELDS])
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def stream_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+            for row in chunk
+        )
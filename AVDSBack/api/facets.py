@@ -0,0 +1,91 @@
+"""Facet counts for the vehicle filter UI.
+
+Each facet is counted with every active filter except its own, so picking a
+make still shows how many vehicles the other makes would return.
+"""
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .caching import make_key
+from .filters import filter_vehicles, normalize_filters
+from .models import VehicleDetail
+
+FACETS_CACHE_TIMEOUT = 300
+DEFAULT_YEAR_BUCKET = 5
+DEFAULT_PRICE_BUCKET = 5000
+
+
+def _bucket_size(params, name, default):
+    try:
+        size = int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return size if size > 0 else default
+
+
+def _counts(params, exclude, group_by, **names):
+    queryset = filter_vehicles(VehicleDetail.objects.all(), params, exclude=exclude)
+    rows = (
+        queryset.values(*group_by)
+        .annotate(count=Count('id'))
+        .order_by('-count', *group_by)
+    )
+    return [
+        {**{key: row[source] for key, source in names.items()}, 'count': row['count']}
+        for row in rows
+    ]
+
+
+def _histogram(params, exclude, field, size):
+    queryset = filter_vehicles(VehicleDetail.objects.all(), params, exclude=exclude)
+    rows = (
+        queryset.filter(**{f'{field}__isnull': False})
+        .annotate(bucket=F(field) / size * size)
+        .values('bucket')
+        .annotate(count=Count('id'))
+        .order_by('bucket')
+    )
+    return [
+        {'from': row['bucket'], 'to': row['bucket'] + size - 1, 'count': row['count']}
+        for row in rows
+    ]
+
+
+def compute_facets(params):
+    year_bucket = _bucket_size(params, 'year_bucket', DEFAULT_YEAR_BUCKET)
+    price_bucket = _bucket_size(params, 'price_bucket', DEFAULT_PRICE_BUCKET)
+    return {
+        'total': filter_vehicles(VehicleDetail.objects.all(), params).count(),
+        'makes': _counts(
+            params, ('make_id', 'make_name'), ('make_id', 'make__make_name'),
+            id='make_id', name='make__make_name',
+        ),
+        'models': _counts(
+            params, ('model_id',), ('model_id', 'model__model_name', 'model__make_id'),
+            id='model_id', name='model__model_name', make_id='model__make_id',
+        ),
+        'bodies': _counts(
+            params, ('body_id',), ('body_id', 'body__body_name'),
+            id='body_id', name='body__body_name',
+        ),
+        'drive_types': _counts(
+            params, ('drive_type_id',), ('drive_type_id', 'drive_type__drive_type_name'),
+            id='drive_type_id', name='drive_type__drive_type_name',
+        ),
+        'years': _histogram(params, ('year', 'min_year', 'max_year'), 'year', year_bucket),
+        'prices': _histogram(params, ('min_price', 'max_price'), 'metadata__price', price_bucket),
+    }
+
+
+def get_facets(params):
+    """Facet counts for ``params``, cached per normalised filter set."""
+    key = make_key('facets', [
+        normalize_filters(params),
+        _bucket_size(params, 'year_bucket', DEFAULT_YEAR_BUCKET),
+        _bucket_size(params, 'price_bucket', DEFAULT_PRICE_BUCKET),
+    ])
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(params)
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,91 @@
+"""Vehicle filtering shared by the list, facets and export endpoints."""
+from . import search
+
+# Query parameters that narrow the vehicle catalog
+FILTER_PARAMS = (
+    'make_id', 'model_id', 'body_id', 'drive_type_id', 'year',
+    'make_name', 'engine', 'min_year', 'max_year', 'min_price', 'max_price', 'q',
+)
+
+# Parameters compared case-insensitively, so their values can be normalised
+CASE_INSENSITIVE_PARAMS = ('make_name', 'engine', 'q')
+
+
+def normalize_filters(params, exclude=()):
+    """Return the active filters as a sorted tuple of (name, value) pairs.
+
+    Blank values are dropped and case-insensitive values are lower-cased, so
+    equivalent requests produce the same result (useful as a cache key).
+    """
+    normalized = []
+    for name in FILTER_PARAMS:
+        if name in exclude:
+            continue
+        value = (params.get(name) or '').strip()
+        if not value:
+            continue
+        if name in CASE_INSENSITIVE_PARAMS:
+            value = value.lower()
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+def filter_vehicles(queryset, params, rank=False, exclude=()):
+    """Apply the vehicle list filters in ``params`` to a VehicleDetail queryset.
+
+    ``exclude`` names parameters to ignore, e.g. to count a facet across all
+    of its own values.
+    """
+    def get(name):
+        return None if name in exclude else params.get(name)
+
+    # Exact matches
+    make_id = get('make_id')
+    model_id = get('model_id')
+    body_id = get('body_id')
+    drive_type_id = get('drive_type_id')
+    year = get('year')
+
+    # Name matches
+    make_name = get('make_name')
+    engine = get('engine')
+
+    # Ranges
+    min_year = get('min_year')
+    max_year = get('max_year')
+    min_price = get('min_price')
+    max_price = get('max_price')
+
+    # Text search
+    q = get('q')
+
+    if make_id:
+        queryset = queryset.filter(make_id=make_id)
+    if make_name:
+        queryset = queryset.filter(make__make_name__iexact=make_name)
+    if model_id:
+        queryset = queryset.filter(model_id=model_id)
+    if body_id:
+        queryset = queryset.filter(body_id=body_id)
+    if drive_type_id:
+        queryset = queryset.filter(drive_type_id=drive_type_id)
+    if year:
+        queryset = queryset.filter(year=year)
+    if engine:
+        queryset = queryset.filter(engine__icontains=engine)
+
+    if min_year:
+        queryset = queryset.filter(year__gte=min_year)
+    if max_year:
+        queryset = queryset.filter(year__lte=max_year)
+
+    # Price lives in the indexed VehicleMetadata.price column (see api/pricing.py)
+    if min_price:
+        queryset = queryset.filter(metadata__price__gte=min_price)
+    if max_price:
+        queryset = queryset.filter(metadata__price__lte=max_price)
+
+    if q:
+        queryset = search.filter_queryset(queryset, q, rank=rank)
+
+    return queryset
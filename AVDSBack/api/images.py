@@ -0,0 +1,149 @@
+"""Resized JPEG and WebP derivatives of uploaded vehicle images.
+
+Uploads are stored as is, and once the upload's transaction commits a
+background thread pool renders each width in ``IMAGE_VARIANT_WIDTHS`` (never
+upscaling) as JPEG and WebP. The stored paths are recorded on
+``VehicleImage.variants`` as ``{"<width>": {"jpeg": path, "webp": path}}``,
+and the serializers pick the smallest variant that covers the width a client
+asks for. List and favorites cards ask for ``IMAGE_CARD_WIDTH`` unless the
+request passes ``?image_width=``. Until the variants exist the original is
+served.
+"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .background import submit_task
+from .caching import bump_vehicle_version
+from .models import VehicleImage
+
+# name -> (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 1280)))
+
+
+def variant_path(image_id, width, extension):
+    return f'vehicle_images/variants/{image_id}/{width}.{extension}'
+
+
+def queue_variants(image_id):
+    """Render variants for ``image_id`` in the pool once the current transaction commits."""
+    # A bad or missing file leaves the image without variants; the original is still served
+    transaction.on_commit(lambda: submit_task(
+        get_executor(), f'Rendering variants for image {image_id}', generate_variants, image_id
+    ))
+
+
+def generate_variants(image_id):
+    """Render and store every variant of one uploaded image. Returns the variants map."""
+    from PIL import Image, ImageOps
+
+    image = VehicleImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return {}
+
+    with image.image.open('rb') as file:
+        source = Image.open(file)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+
+    # Widths narrower than the original; a small original gets one re-encoded copy
+    widths = [width for width in variant_widths() if width < source.width] or [source.width]
+
+    variants = {}
+    for width in widths:
+        height = max(1, round(source.height * width / source.width))
+        resized = source.resize((width, height), Image.LANCZOS)
+        variants[str(width)] = {}
+        for name, (pil_format, extension, options) in VARIANT_FORMATS.items():
+            frame = resized
+            if pil_format == 'JPEG' and frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            elif frame.mode not in ('RGB', 'RGBA'):
+                frame = frame.convert('RGBA')
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+            path = variant_path(image.pk, width, extension)
+            # Regenerating replaces the old file instead of saving under a new name
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variants[str(width)][name] = default_storage.save(path, ContentFile(buffer.getvalue()))
+
+    # update() skips post_save; bump the vehicle version so cached payloads pick up the URLs
+    VehicleImage.objects.filter(pk=image.pk).update(variants=variants)
+    bump_vehicle_version(image.vehicle_id)
+    return variants
+
+
+def delete_variants(image):
+    for formats in (image.variants or {}).values():
+        for path in formats.values():
+            default_storage.delete(path)
+
+
+def variant_urls(image):
+    """``{"<width>": {"jpeg": url, "webp": url}}`` for a VehicleImage, or None."""
+    if not image.variants:
+        return None
+    return {
+        width: {name: default_storage.url(path) for name, path in formats.items()}
+        for width, formats in image.variants.items()
+    }
+
+
+def card_image_width():
+    """Default image width (px) for endpoints that render vehicle cards."""
+    return getattr(settings, 'IMAGE_CARD_WIDTH', 320)
+
+
+def image_size(request, default_width=None):
+    """(width, format) from ``?image_width=`` and ``?image_format=``.
+
+    The width falls back to ``default_width``; ``image_width=original`` asks
+    for the original whatever the default. The format defaults to 'jpeg'.
+    """
+    params = request.query_params if request is not None else {}
+    width = params.get('image_width', '').strip().lower()
+    if width == 'original':
+        width = None
+    else:
+        width = int(width) if width.isdigit() and int(width) > 0 else default_width
+    image_format = params.get('image_format', 'jpeg').strip().lower()
+    if image_format not in VARIANT_FORMATS:
+        image_format = 'jpeg'
+    return width, image_format
+
+
+def image_url(image, width=None, image_format='jpeg'):
+    """URL of the smallest variant at least ``width`` wide, else the original."""
+    if width and image.variants:
+        widths = sorted(int(key) for key in image.variants)
+        chosen = next((key for key in widths if key >= width), None)
+        if chosen is not None:
+            formats = image.variants[str(chosen)]
+            path = formats.get(image_format) or formats.get('jpeg')
+            if path:
+                return default_storage.url(path)
+    return image.image.url if image.image else image.image_url
@@ -0,0 +1,190 @@
+"""Streaming bulk importer for vehicle CSV uploads.
+
+The upload used to read the whole file into memory and, for every row, count
+makes and models, look up the highest vehicle ID and run several
+``get_or_create``/``create`` calls outside any transaction. The importer
+instead streams rows, resolves makes and models from in-memory maps,
+allocates IDs in blocks and writes each chunk with ``bulk_create`` inside its
+own transaction. ``bulk_create`` skips ``post_save``, so the
+``vehicles_imported`` signal is sent once each chunk commits to keep prices,
+the search index and caches in sync (see api/signals.py).
+
+The maps and ID counters are reloaded from the database at the start of
+every chunk, and each chunk holds ``import_lock`` from that reload until it
+commits, so an upload and a background job in one process interleave chunk by
+chunk without handing out the same IDs.
+"""
+import codecs
+import csv
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Make, MakeModel, VehicleDetail, VehicleImage
+from .signals import vehicles_imported
+
+REQUIRED_COLUMNS = ['make', 'model', 'year', 'price', 'engine']
+
+# Row errors kept in the result; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Held by each chunk of every import in this process, upload or background job alike
+import_lock = threading.Lock()
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    makes_created: int = 0
+    models_created: int = 0
+    rows_processed: int = 0
+    error_count: int = 0
+    errors: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows_processed / self.elapsed, 1) if self.elapsed else 0.0
+
+    def add_error(self, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+def read_csv_rows(file):
+    """Stream dict rows from an uploaded CSV file without loading it into memory."""
+    reader = csv.DictReader(codecs.iterdecode(file, 'utf-8-sig'))
+    if not reader.fieldnames or not all(col in reader.fieldnames for col in REQUIRED_COLUMNS):
+        raise ImportFormatError(f'Missing required columns: {REQUIRED_COLUMNS}')
+    return reader
+
+
+class VehicleImporter:
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or getattr(settings, 'VEHICLE_IMPORT_CHUNK_SIZE', 1000)
+
+    def _load_state(self):
+        self.makes = {name: pk for pk, name in Make.objects.values_list('make_id', 'make_name')}
+        self.models = {
+            (make_id, name): pk
+            for pk, make_id, name in MakeModel.objects.values_list('model_id', 'make_id', 'model_name')
+        }
+        # IDs are handed out from in-memory counters instead of a query per row
+        self.next_make_id = (Make.objects.aggregate(m=Max('make_id'))['m'] or 0) + 1
+        self.next_model_id = (MakeModel.objects.aggregate(m=Max('model_id'))['m'] or 0) + 1
+        self.next_vehicle_id = (VehicleDetail.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+
+    def import_rows(self, rows, start_index=0, on_chunk=None):
+        """Import ``rows`` (dicts), numbering them from ``start_index``.
+
+        ``on_chunk(result, next_index)`` is called after every chunk. For a
+        chunk that is written it runs inside the chunk's transaction, so a
+        checkpoint saved there commits together with the rows it covers.
+        """
+        result = ImportResult()
+        started = time.monotonic()
+        chunk = []
+        for index, row in enumerate(rows, start=start_index):
+            chunk.append((index, row))
+            if len(chunk) >= self.chunk_size:
+                with import_lock:
+                    self._import_chunk(chunk, result, started, on_chunk)
+                chunk = []
+        if chunk:
+            with import_lock:
+                self._import_chunk(chunk, result, started, on_chunk)
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def _import_chunk(self, chunk, result, started, on_chunk=None):
+        # Another process may have added makes, models or vehicles since the last chunk
+        self._load_state()
+        new_makes, new_models, vehicles, images = [], [], [], []
+        row_indexes = []
+        for index, row in chunk:
+            try:
+                make_name = (row.get('make') or '').strip()
+                model_name = (row.get('model') or '').strip()
+                if not make_name or not model_name:
+                    raise ValueError('make and model are required')
+                year = (row.get('year') or '').strip()
+                year = int(year) if year else None
+
+                # Find or create Make
+                make_id = self.makes.get(make_name)
+                if make_id is None:
+                    make_id = self.next_make_id
+                    self.next_make_id += 1
+                    self.makes[make_name] = make_id
+                    new_makes.append(Make(make_id=make_id, make_name=make_name))
+
+                # Find or create Model
+                model_id = self.models.get((make_id, model_name))
+                if model_id is None:
+                    model_id = self.next_model_id
+                    self.next_model_id += 1
+                    self.models[(make_id, model_name)] = model_id
+                    new_models.append(MakeModel(model_id=model_id, make_id=make_id, model_name=model_name))
+
+                vehicle = VehicleDetail(
+                    id=self.next_vehicle_id,
+                    make_id=make_id,
+                    model_id=model_id,
+                    year=year,
+                    engine=row.get('engine'),
+                    vehicle_display_name=f"{make_name} {model_name} {row.get('year')}"
+                )
+                self.next_vehicle_id += 1
+                vehicles.append(vehicle)
+                row_indexes.append(index)
+
+                # Handle Image URL
+                if row.get('image_url'):
+                    images.append(VehicleImage(vehicle_id=vehicle.id, image_url=row['image_url'], is_primary=True))
+            except Exception as e:
+                result.add_error(f"Row {index}: {str(e)}")
+        result.rows_processed += len(chunk)
+        next_index = chunk[-1][0] + 1
+        counts = (result.imported, result.makes_created, result.models_created)
+
+        try:
+            with transaction.atomic():
+                Make.objects.bulk_create(new_makes)
+                MakeModel.objects.bulk_create(new_models)
+                VehicleDetail.objects.bulk_create(vehicles)
+                VehicleImage.objects.bulk_create(images)
+                # Receivers touch caches, the dashboard and worker queues, which
+                # must not see rows that a failed chunk rolls back
+                transaction.on_commit(partial(
+                    vehicles_imported.send,
+                    sender=VehicleDetail,
+                    vehicle_ids=[vehicle.id for vehicle in vehicles],
+                    makes=new_makes,
+                    models=new_models,
+                    vehicles=vehicles,
+                ))
+                result.imported += len(vehicles)
+                result.makes_created += len(new_makes)
+                result.models_created += len(new_models)
+                if on_chunk:
+                    result.elapsed = time.monotonic() - started
+                    on_chunk(result, next_index)
+        except Exception as e:
+            # Nothing from this chunk was written; the next chunk reloads the maps and counters
+            result.imported, result.makes_created, result.models_created = counts
+            for index in row_indexes:
+                result.add_error(f"Row {index}: {str(e)}")
+            if on_chunk:
+                result.elapsed = time.monotonic() - started
+                on_chunk(result, next_index)
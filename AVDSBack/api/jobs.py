@@ -0,0 +1,141 @@
+"""Background vehicle import jobs.
+
+Large uploads are stored under ``MEDIA_ROOT/imports/`` and imported by an
+in-process thread pool, so the request returns as soon as the file is saved.
+Each committed chunk checkpoints the job row (rows done, counts, errors and
+elapsed time) in the same transaction as the vehicles it wrote, so a job
+interrupted by a crash or restart resumes from the last committed chunk:
+``POST /api/admin/import-jobs/<id>/resume/`` or the ``resume_import_jobs``
+management command.
+
+A runner claims its job with one conditional UPDATE before importing, so a
+job is never run twice at once, whichever worker or command starts it. The
+checkpoints double as a heartbeat: a running job whose ``updated_at`` is
+older than ``IMPORT_JOB_STALE_AFTER`` seconds is taken to have died with its
+process and can be claimed again.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .background import submit_task
+from .catalog import build_snapshot
+from .importer import MAX_REPORTED_ERRORS, VehicleImporter, read_csv_rows
+from .models import ImportJob
+
+_executor = None
+_active = set()
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # Chunks of concurrent imports take turns on importer.import_lock,
+            # so extra workers add little; keep IMPORT_WORKERS at 1.
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMPORT_WORKERS', 1),
+                thread_name_prefix='import-job',
+            )
+        return _executor
+
+
+def is_active(job_id):
+    """Whether the job is queued or running in this process."""
+    with _lock:
+        return job_id in _active
+
+
+def submit_job(job):
+    """Queue ``job`` on the worker pool. Returns False if it is already queued here."""
+    with _lock:
+        if job.pk in _active:
+            return False
+        _active.add(job.pk)
+    submit_task(get_executor(), f'Import job {job.pk}', _run_active, job.pk)
+    return True
+
+
+def _run_active(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        with _lock:
+            _active.discard(job_id)
+
+
+def stale_before():
+    """Running jobs last checkpointed before this are assumed dead."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_STALE_AFTER', 120))
+
+
+def is_running_elsewhere(job):
+    return job.status == ImportJob.STATUS_RUNNING and job.updated_at >= stale_before()
+
+
+def claim_job(job_id):
+    """Mark the job running unless it is completed or another runner holds it. Returns True if claimed."""
+    claimable = Q(status__in=[ImportJob.STATUS_PENDING, ImportJob.STATUS_FAILED]) | Q(
+        status=ImportJob.STATUS_RUNNING, updated_at__lt=stale_before()
+    )
+    return ImportJob.objects.filter(claimable, pk=job_id).update(
+        status=ImportJob.STATUS_RUNNING, message='', updated_at=timezone.now()
+    ) == 1
+
+
+def run_job(job_id):
+    """Import the job's file, starting from its checkpoint.
+
+    Returns the job, or None if it could not be claimed (completed, or
+    running elsewhere).
+    """
+    if not claim_job(job_id):
+        return None
+    job = ImportJob.objects.get(pk=job_id)
+
+    # Totals from earlier runs of this job; each run adds its own result
+    base = ImportJob.objects.values(
+        'imported_count', 'makes_created', 'models_created', 'error_count', 'errors', 'elapsed_seconds'
+    ).get(pk=job.pk)
+
+    # Also the heartbeat that keeps other runners from claiming the job
+    def checkpoint(result, next_index):
+        ImportJob.objects.filter(pk=job.pk).update(
+            rows_done=next_index,
+            imported_count=base['imported_count'] + result.imported,
+            makes_created=base['makes_created'] + result.makes_created,
+            models_created=base['models_created'] + result.models_created,
+            error_count=base['error_count'] + result.error_count,
+            errors=(base['errors'] + result.errors)[:MAX_REPORTED_ERRORS],
+            elapsed_seconds=base['elapsed_seconds'] + result.elapsed,
+            updated_at=timezone.now(),
+        )
+
+    try:
+        with job.file.open('rb') as file:
+            rows = read_csv_rows(file)
+            # Rows before the checkpoint were committed by an earlier run
+            rows = islice(rows, job.rows_done, None)
+            VehicleImporter().import_rows(rows, start_index=job.rows_done, on_chunk=checkpoint)
+    except Exception as e:
+        job.refresh_from_db()
+        job.status = ImportJob.STATUS_FAILED
+        job.message = str(e)
+        job.save(update_fields=['status', 'message', 'updated_at'])
+        return job
+
+    job.refresh_from_db()
+    job.status = ImportJob.STATUS_COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    # New makes or models change the reference catalog snapshot
+    if job.makes_created or job.models_created:
+        build_snapshot()
+    return job
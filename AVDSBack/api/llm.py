@@ -0,0 +1,191 @@
+"""Client for the Ollama chat backend.
+
+One ``requests.Session`` per process keeps connections to Ollama alive
+between chat requests instead of opening a new one per call. Every call has
+a connect deadline and a read deadline (``OLLAMA_TIMEOUT``). When streaming,
+the read deadline applies to the gap between chunks, not to the whole
+generation. ``stream_chat`` yields content pieces as Ollama produces them,
+which is what the SSE mode of ``ChatView`` relays.
+
+``AsyncOllamaClient`` is the same API over ``httpx.AsyncClient`` for
+``AsyncChatView`` under ASGI: a request waiting on Ollama holds no thread.
+Each event loop gets its own client and connection pool.
+"""
+import asyncio
+import json
+import threading
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class LLMError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaClient:
+    def __init__(self, base_url=None, model=None, timeout=None, pool_size=None):
+        self._base_url = base_url
+        self._model = model
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    # Settings are read on use so tests and management commands can override them
+    @property
+    def base_url(self):
+        return (self._base_url or getattr(settings, 'OLLAMA_URL', 'http://localhost:11434')).rstrip('/')
+
+    @property
+    def model(self):
+        return self._model or getattr(settings, 'OLLAMA_MODEL', 'gpt-oss:20b-cloud')
+
+    @property
+    def timeout(self):
+        return self._timeout or getattr(settings, 'OLLAMA_TIMEOUT', (3.05, 120))
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    pool_size = self._pool_size or getattr(settings, 'OLLAMA_POOL_SIZE', 10)
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def _post(self, path, payload, stream=False):
+        try:
+            response = self.session.post(
+                f'{self.base_url}{path}', json=payload, timeout=self.timeout, stream=stream
+            )
+        except requests.RequestException as e:
+            raise LLMError(f'AI Service Unavailable: {e}') from e
+        if response.status_code != 200:
+            response.close()
+            raise LLMError(f'AI Service returned {response.status_code}', status_code=response.status_code)
+        return response
+
+    def chat(self, messages):
+        """Return the assistant reply for ``messages`` (Ollama /api/chat)."""
+        response = self._post('/api/chat', {'model': self.model, 'messages': messages, 'stream': False})
+        try:
+            # Ollama /api/chat returns 'message': {'role': 'assistant', 'content': '...'}
+            return response.json().get('message', {}).get('content', '')
+        except ValueError as e:
+            raise LLMError('Invalid response from AI Service') from e
+
+    def generate(self, prompt):
+        """Return the completion for a flat ``prompt`` (Ollama /api/generate)."""
+        response = self._post('/api/generate', {'model': self.model, 'prompt': prompt, 'stream': False})
+        try:
+            return response.json().get('response', '')
+        except ValueError as e:
+            raise LLMError('Invalid response from AI Service') from e
+
+    def stream_chat(self, messages):
+        """Yield reply content pieces for ``messages`` as Ollama streams them."""
+        response = self._post('/api/chat', {'model': self.model, 'messages': messages, 'stream': True}, stream=True)
+        try:
+            # Ollama streams one JSON object per line; the last one has "done": true
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise LLMError(chunk['error'])
+                content = chunk.get('message', {}).get('content', '')
+                if content:
+                    yield content
+                if chunk.get('done'):
+                    break
+        except requests.RequestException as e:
+            raise LLMError(f'AI Service Unavailable: {e}') from e
+        except ValueError as e:
+            raise LLMError('Invalid response from AI Service') from e
+        finally:
+            response.close()
+
+
+class AsyncOllamaClient(OllamaClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # httpx clients are bound to the loop they were first used on
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            pool_size = self._pool_size or getattr(settings, 'OLLAMA_POOL_SIZE', 10)
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect, pool=connect),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _post(self, path, payload):
+        try:
+            response = await self.get_client().post(f'{self.base_url}{path}', json=payload)
+        except httpx.HTTPError as e:
+            raise LLMError(f'AI Service Unavailable: {e}') from e
+        if response.status_code != 200:
+            raise LLMError(f'AI Service returned {response.status_code}', status_code=response.status_code)
+        return response
+
+    async def chat(self, messages):
+        response = await self._post('/api/chat', {'model': self.model, 'messages': messages, 'stream': False})
+        try:
+            return response.json().get('message', {}).get('content', '')
+        except ValueError as e:
+            raise LLMError('Invalid response from AI Service') from e
+
+    async def generate(self, prompt):
+        response = await self._post('/api/generate', {'model': self.model, 'prompt': prompt, 'stream': False})
+        try:
+            return response.json().get('response', '')
+        except ValueError as e:
+            raise LLMError('Invalid response from AI Service') from e
+
+    async def stream_chat(self, messages):
+        payload = {'model': self.model, 'messages': messages, 'stream': True}
+        try:
+            async with self.get_client().stream('POST', f'{self.base_url}/api/chat', json=payload) as response:
+                if response.status_code != 200:
+                    raise LLMError(f'AI Service returned {response.status_code}', status_code=response.status_code)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise LLMError(chunk['error'])
+                    content = chunk.get('message', {}).get('content', '')
+                    if content:
+                        yield content
+                    if chunk.get('done'):
+                        break
+        except httpx.HTTPError as e:
+            raise LLMError(f'AI Service Unavailable: {e}') from e
+        except ValueError as e:
+            raise LLMError('Invalid response from AI Service') from e
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event carrying ``data`` as JSON."""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+ollama_client = OllamaClient()
+async_ollama_client = AsyncOllamaClient()
@@ -0,0 +1,286 @@
+"""Offline chat benchmarking.
+
+``FakeOllamaServer`` stands in for Ollama on ``/api/chat`` and
+``/api/generate``. It waits ``latency`` seconds before the first token and
+then emits tokens at ``token_rate`` per second. It streams NDJSON when asked
+to, and fails a fraction ``error_rate`` of requests, either with an HTTP
+status or with an error line mid-stream. Run it with ``manage.py
+fake_ollama`` on Ollama's port and the chat views need no settings change.
+
+``ChatLoadTest`` sends chat requests at each concurrency level and reports
+p50/p95/p99 latency, time to first token and the error rate
+(``manage.py chat_loadtest``).
+"""
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+FAKE_REPLY = (
+    "Based on the catalog, the Toyota RAV4 and the Honda CR-V are both reliable "
+    "SUVs in that price range with good fuel economy and plenty of cargo space."
+)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self.send_json(400, {'error': 'invalid JSON'})
+        if self.path not in ('/api/chat', '/api/generate'):
+            return self.send_json(404, {'error': 'not found'})
+
+        server = self.server
+        fail = server.error_rate and server.random.random() < server.error_rate
+        if fail and not (server.error_mid_stream and payload.get('stream')):
+            return self.send_json(server.error_status, {'error': 'injected failure'})
+
+        time.sleep(server.latency)
+        tokens = server.reply_tokens()
+        if payload.get('stream'):
+            self.stream(tokens, fail)
+        else:
+            time.sleep(len(tokens) / server.token_rate)
+            self.send_json(200, self.chunk(''.join(tokens), done=True))
+
+    def chunk(self, content, done=False):
+        # Same shapes as Ollama: "message" for /api/chat, "response" for /api/generate
+        body = {'model': self.server.model, 'done': done}
+        if self.path == '/api/chat':
+            body['message'] = {'role': 'assistant', 'content': content}
+        else:
+            body['response'] = content
+        return body
+
+    def stream(self, tokens, fail):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        delay = 1 / self.server.token_rate
+        try:
+            for index, token in enumerate(tokens):
+                if fail and index == 1:
+                    self.write_chunk({'error': 'injected failure'})
+                    break
+                self.write_chunk(self.chunk(token))
+                time.sleep(delay)
+            else:
+                self.write_chunk(self.chunk('', done=True))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def write_chunk(self, body):
+        line = json.dumps(body).encode() + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def send_json(self, status_code, body):
+        data = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=11434, latency=0.2, token_rate=50.0, tokens=40,
+                 error_rate=0.0, error_status=500, error_mid_stream=False, model='fake',
+                 seed=None, verbose=False):
+        super().__init__((host, port), FakeOllamaHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.error_mid_stream = error_mid_stream
+        self.model = model
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        words = FAKE_REPLY.split(' ')
+        self._words = [word if index == 0 else f' {word}' for index, word in enumerate(words)]
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections is normal under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def reply_tokens(self):
+        return [self._words[index % len(self._words)] for index in range(self.tokens)]
+
+    def start(self):
+        """Serve from a daemon thread; returns the server for chaining."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+@dataclass
+class RequestSample:
+    status_code: int
+    latency: float
+    ttft: float = None
+    error: str = ''
+
+
+@dataclass
+class LevelReport:
+    concurrency: int
+    requests: int
+    elapsed: float
+    errors: int
+    status_codes: Dict[str, int]
+    latency_ms: Dict[str, float]
+    ttft_ms: Dict[str, float]
+    error_samples: List[str] = field(default_factory=list)
+
+    @property
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def throughput(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        data = asdict(self)
+        data.update(error_rate=round(self.error_rate, 4), throughput=round(self.throughput, 2))
+        return data
+
+
+def _summary_ms(values):
+    return {
+        name: round(value * 1000, 1) if value is not None else None
+        for name, value in (
+            ('p50', percentile(values, 50)), ('p95', percentile(values, 95)), ('p99', percentile(values, 99)),
+        )
+    }
+
+
+class ChatLoadTest:
+    """Drives a chat endpoint at fixed concurrency and collects latency samples.
+
+    Requests opt out of the response cache unless ``use_cache`` is set, so the
+    figures measure the full path to the LLM. With ``stream`` the time to first
+    token is the arrival of the first ``token`` event; otherwise it equals the
+    full latency.
+    """
+
+    def __init__(self, url, message, stream=False, use_cache=False, token=None, timeout=(3.05, 120)):
+        self.url = url
+        self.message = message
+        self.stream = stream
+        self.use_cache = use_cache
+        self.timeout = timeout
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+    def session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def payload(self, index):
+        payload = {'message': self.message.format(n=index), 'stream': self.stream}
+        if not self.use_cache:
+            payload['cache'] = False
+        return payload
+
+    def send(self, session, index):
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                self.url, json=self.payload(index), headers=self.headers, timeout=self.timeout, stream=True
+            )
+        except requests.RequestException as e:
+            return RequestSample(0, time.perf_counter() - started, error=str(e))
+        with response:
+            if response.status_code != 200:
+                return RequestSample(response.status_code, time.perf_counter() - started,
+                                     error=f'HTTP {response.status_code}')
+            if not self.stream:
+                try:
+                    response.json()
+                except ValueError:
+                    return RequestSample(200, time.perf_counter() - started, error='invalid JSON')
+                latency = time.perf_counter() - started
+                return RequestSample(200, latency, ttft=latency)
+
+            ttft, error, event = None, '', None
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith('event:'):
+                        event = line[6:].strip()
+                    elif line.startswith('data:'):
+                        if event == 'error':
+                            error = json.loads(line[5:]).get('error', 'stream error')
+                        elif ttft is None and event is None:
+                            ttft = time.perf_counter() - started
+                    elif not line:
+                        event = None
+            except requests.RequestException as e:
+                error = str(e)
+            return RequestSample(200, time.perf_counter() - started, ttft=ttft, error=error)
+
+    def run_level(self, concurrency, requests_count):
+        session = self.session(concurrency)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(lambda index: self.send(session, index), range(requests_count)))
+        elapsed = time.perf_counter() - started
+        session.close()
+
+        status_codes = {}
+        for sample in samples:
+            status_codes[str(sample.status_code)] = status_codes.get(str(sample.status_code), 0) + 1
+        failed = [sample for sample in samples if sample.error]
+        ok = [sample for sample in samples if not sample.error]
+        return LevelReport(
+            concurrency=concurrency,
+            requests=len(samples),
+            elapsed=round(elapsed, 3),
+            errors=len(failed),
+            status_codes=status_codes,
+            latency_ms=_summary_ms([sample.latency for sample in ok]),
+            ttft_ms=_summary_ms([sample.ttft for sample in ok if sample.ttft is not None]),
+            error_samples=sorted({sample.error for sample in failed})[:5],
+        )
+
+    def run(self, levels, requests_per_level, warmup=0):
+        if warmup:
+            self.run_level(min(levels), warmup)
+        return [self.run_level(concurrency, requests_per_level) for concurrency in levels]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.catalog import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Precomputes the reference catalog snapshot served by /api/catalog/'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Building catalog snapshot...')
+        snapshot = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Catalog snapshot {snapshot.version}: {len(snapshot.body)} bytes, {len(snapshot.gzipped)} gzipped'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.remote_images import RemoteImageFetcher, pending_images
+
+
+class Command(BaseCommand):
+    help = 'Downloads vehicle images that are only referenced by a remote image_url into local media'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Concurrent downloads (default REMOTE_IMAGE_WORKERS)')
+
+    def handle(self, *args, **options):
+        pending = pending_images()
+        self.stdout.write(f'Caching {pending.count()} remote images...')
+        stats = RemoteImageFetcher(workers=options['workers']).cache_images(pending)
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Cached {stats['cached']} images from {stats['downloaded']} downloads, {stats['failed']} URLs failed"
+        ))
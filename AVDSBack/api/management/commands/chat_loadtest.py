@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import ChatLoadTest
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks a chat endpoint at set concurrency levels (latency percentiles, TTFT, error rate)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/chat/',
+                            help='Chat endpoint, e.g. /api/chat/ or /api/chat/async/')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per concurrency level')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests before the first level')
+        parser.add_argument('--message', default='Any reliable SUVs under 30k? (#{n})',
+                            help='Message; {n} is replaced by the request number')
+        parser.add_argument('--stream', action='store_true', help='Request SSE replies and measure time to first token')
+        parser.add_argument('--use-cache', action='store_true', help='Allow chat response cache hits')
+        parser.add_argument('--token', help='JWT access token to send')
+        parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError('--concurrency must be comma-separated integers')
+        if not levels or min(levels) < 1 or options['requests'] < 1:
+            raise CommandError('Concurrency levels and --requests must be positive')
+
+        load_test = ChatLoadTest(
+            options['url'], options['message'], stream=options['stream'],
+            use_cache=options['use_cache'], token=options['token'],
+        )
+        reports = load_test.run(levels, options['requests'], warmup=options['warmup'])
+
+        if options['json']:
+            self.stdout.write(json.dumps([report.as_dict() for report in reports], indent=2))
+            return
+
+        self.stdout.write(
+            f"{'conc':>5} {'reqs':>5} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'ttft p50':>9} {'ttft p95':>9} {'errors':>7}"
+        )
+        for report in reports:
+            latency, ttft = report.latency_ms, report.ttft_ms
+            self.stdout.write(
+                f"{report.concurrency:>5} {report.requests:>5} {report.throughput:>7.1f} "
+                f"{_ms(latency['p50']):>8} {_ms(latency['p95']):>8} {_ms(latency['p99']):>8} "
+                f"{_ms(ttft['p50']):>9} {_ms(ttft['p95']):>9} {report.error_rate:>7.1%}"
+            )
+            for error in report.error_samples:
+                self.stdout.write(self.style.WARNING(f'  {error}'))
+
+
+def _ms(value):
+    return '-' if value is None else f'{value:.0f}'
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from api.loadtest import FakeOllamaServer
+
+
+class Command(BaseCommand):
+    help = 'Serves a fake Ollama /api/chat and /api/generate for offline chat benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=11434, help="Ollama's default port, so OLLAMA_URL needs no change")
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds before the first token')
+        parser.add_argument('--token-rate', type=float, default=50.0, help='Tokens per second after the first')
+        parser.add_argument('--tokens', type=int, default=40, help='Tokens per reply')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (0-1)')
+        parser.add_argument('--error-status', type=int, default=500, help='HTTP status of injected failures')
+        parser.add_argument('--error-mid-stream', action='store_true',
+                            help='Fail streamed requests with an error line after the first token')
+        parser.add_argument('--seed', type=int, help='Seed for reproducible error injection')
+        parser.add_argument('--verbose', action='store_true', help='Log each request')
+
+    def handle(self, *args, **options):
+        server = FakeOllamaServer(
+            host=options['host'], port=options['port'], latency=options['latency'],
+            token_rate=options['token_rate'], tokens=options['tokens'], error_rate=options['error_rate'],
+            error_status=options['error_status'], error_mid_stream=options['error_mid_stream'],
+            seed=options['seed'], verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Ollama on {server.url}: {options['latency']}s to first token, "
+            f"{options['token_rate']} tokens/s, {options['tokens']} tokens, {options['error_rate']:.0%} errors"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from api.models import VehicleImage
+
+
+class Command(BaseCommand):
+    help = 'Renders resized JPEG/WebP variants for uploaded vehicle images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render images that already have variants')
+
+    def handle(self, *args, **options):
+        images = VehicleImage.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            images = images.filter(variants={})
+        done = 0
+        for image_id in images.values_list('pk', flat=True).iterator():
+            try:
+                generate_variants(image_id)
+                done += 1
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Image {image_id}: {e}'))
+        self.stdout.write(self.style.SUCCESS(f'Rendered variants for {done} images'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text vehicle search index'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding search index...')
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} vehicles'))
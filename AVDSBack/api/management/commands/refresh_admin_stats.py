@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.stats import refresh_stats
+
+
+class Command(BaseCommand):
+    help = 'Recounts the precomputed admin dashboard figures (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        stats = refresh_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed admin stats: {stats['total_vehicles']} vehicles, {stats['total_users']} users, "
+            f"{stats['total_reviews']} reviews"
+        ))
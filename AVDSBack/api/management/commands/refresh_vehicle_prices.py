@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.pricing import refresh_vehicle_prices
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored, indexed price for every vehicle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write('Refreshing vehicle prices...')
+        total = refresh_vehicle_prices(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated prices for {total} vehicles'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import run_job
+from api.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Resumes import jobs interrupted by a crash or restart from their last checkpoint'
+
+    def handle(self, *args, **options):
+        jobs = ImportJob.objects.filter(
+            status__in=[ImportJob.STATUS_PENDING, ImportJob.STATUS_RUNNING]
+        ).order_by('created_at')
+        for job in jobs:
+            self.stdout.write(f'Resuming import {job.pk} ({job.original_name}) from row {job.rows_done}...')
+            job_id = job.pk
+            job = run_job(job_id)
+            if job is None:
+                self.stdout.write(self.style.WARNING(
+                    f'Import {job_id} is still running elsewhere; it can be resumed once its '
+                    f'checkpoints stop for IMPORT_JOB_STALE_AFTER seconds'
+                ))
+            elif job.status == ImportJob.STATUS_COMPLETED:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Import {job.pk}: {job.imported_count} imported, {job.error_count} errors'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f'Import {job.pk} failed: {job.message}'))
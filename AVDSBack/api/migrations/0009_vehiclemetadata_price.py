@@ -0,0 +1,45 @@
+# Generated by Django 4.2.16 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+def backfill_prices(apps, schema_editor):
+    VehicleDetail = apps.get_model('api', 'VehicleDetail')
+    VehicleMetadata = apps.get_model('api', 'VehicleMetadata')
+
+    # VehicleDetails is an unmanaged table and may be missing on fresh databases
+    if VehicleDetail._meta.db_table not in schema_editor.connection.introspection.table_names():
+        return
+
+    prices = {}
+    for vehicle_id, year, engine_cc in VehicleDetail.objects.values_list('id', 'year', 'engine_cc').iterator():
+        year = year if year is not None else 2000
+        engine_cc = engine_cc if engine_cc is not None else 2000
+        prices[vehicle_id] = 20000 + (year - 1990) * 500 + engine_cc * 5
+
+    existing = list(VehicleMetadata.objects.all())
+    for metadata in existing:
+        metadata.price = prices.get(metadata.vehicle_id)
+    VehicleMetadata.objects.bulk_update(existing, ['price'], batch_size=1000)
+
+    seen = {metadata.vehicle_id for metadata in existing}
+    VehicleMetadata.objects.bulk_create(
+        [VehicleMetadata(vehicle_id=vehicle_id, price=price) for vehicle_id, price in prices.items() if vehicle_id not in seen],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_vehiclemetadata_views_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiclemetadata',
+            name='price',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Frozen copies of the statements in api/search.py
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_search USING fts5("
+    "display_name, make_name, model_name, custom_title, description, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+POPULATE_SQL = (
+    "INSERT INTO vehicle_search (rowid, display_name, make_name, model_name, custom_title, description) "
+    'SELECT v."ID", v."Vehicle_Display_Name", mk."Make", mm."ModelName", md.custom_title, md.description '
+    'FROM "VehicleDetails" v '
+    'LEFT JOIN "Makes" mk ON mk."MakeID" = v."MakeID" '
+    'LEFT JOIN "MakeModels" mm ON mm."ModelID" = v."ModelID" '
+    'LEFT JOIN api_vehiclemetadata md ON md.vehicle_id = v."ID"'
+)
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends keep the icontains search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    if 'VehicleDetails' in schema_editor.connection.introspection.table_names():
+        schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS vehicle_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_vehiclemetadata_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+def merge_duplicate_queries(apps, schema_editor):
+    SearchAnalytics = apps.get_model('api', 'SearchAnalytics')
+    keep = {}
+    for row in SearchAnalytics.objects.order_by('id'):
+        first = keep.get(row.query)
+        if first is None:
+            keep[row.query] = row
+            continue
+        first.count += row.count
+        first.last_searched = max(first.last_searched, row.last_searched)
+        SearchAnalytics.objects.filter(pk=first.pk).update(count=first.count, last_searched=first.last_searched)
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_vehicle_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_queries, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='searchanalytics',
+            name='query',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
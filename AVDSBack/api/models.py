@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 class Make(models.Model):
@@ -93,6 +95,14 @@ class VehicleMetadata(models.Model):
     description = models.TextField(blank=True, null=True)
     custom_title = models.CharField(max_length=255, blank=True, null=True)
     views_count = models.IntegerField(default=0)
+    # Denormalised list price so range filters and price sorts can use an index
+    price = models.IntegerField(null=True, blank=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self.price is None:
+            from .pricing import estimate_price
+            self.price = estimate_price(self.vehicle.year, self.vehicle.engine_cc)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Metadata for {self.vehicle.id}"
@@ -102,15 +112,19 @@ class VehicleImage(models.Model):
     image = models.ImageField(upload_to='vehicle_images/', null=True, blank=True)
     image_url = models.URLField(max_length=500, null=True, blank=True)
     is_primary = models.BooleanField(default=False)
+    # Resized JPEG/WebP copies of `image`: {"<width>": {"jpeg": path, "webp": path}} (see api/images.py)
+    variants = models.JSONField(default=dict, blank=True)
+    # SHA-256 of a local copy downloaded from image_url (see api/remote_images.py)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.vehicle.id}"
 
 class SearchAnalytics(models.Model):
-    query = models.CharField(max_length=255)
+    query = models.CharField(max_length=255, unique=True)
     count = models.IntegerField(default=1)
-    last_searched = models.DateTimeField(auto_now=True)
+    last_searched = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.query} ({self.count})"
@@ -127,3 +141,77 @@ class HomepageFeature(models.Model):
 
     def __str__(self):
         return self.title_en
+
+class ImportJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/')
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Checkpoint: index of the first row not yet committed
+    rows_done = models.IntegerField(default=0)
+    imported_count = models.IntegerField(default=0)
+    makes_created = models.IntegerField(default=0)
+    models_created = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    elapsed_seconds = models.FloatField(default=0)
+    message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows_done / self.elapsed_seconds, 1) if self.elapsed_seconds else 0.0
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.status})"
+
+class ChatSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='chat_sessions')
+    # Rolling summary of every turn up to and including summarized_through (a ChatTurn id)
+    summary = models.TextField(blank=True, default='')
+    summarized_through = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Chat session {self.id}"
+
+class ChatTurn(models.Model):
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='turns')
+    role = models.CharField(max_length=20)
+    content = models.TextField()
+    tokens = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.role}: {self.content[:50]}"
+
+class StatsRollup(models.Model):
+    """One precomputed admin dashboard figure (see api/stats.py)."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    # Payload for list figures such as the top searches
+    data = models.JSONField(default=list, blank=True)
+    # Last full recount; counters are adjusted incrementally in between
+    refreshed_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
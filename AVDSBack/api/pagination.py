@@ -0,0 +1,150 @@
+"""Keyset (cursor) pagination for the vehicle list.
+
+Page-number pagination runs ``COUNT(*)`` and ``OFFSET`` on every request, so
+deep pages get slower the further a client scrolls. Keyset pagination instead
+remembers the sort key of the last row it returned and resumes with a
+``WHERE (key, id) > (last_key, last_id)`` filter, which costs the same at any
+depth and needs no count query.
+
+Views opt in by providing ``get_sort_keys()``, a sequence of
+``(field, descending)`` pairs whose last entry is a unique tie-breaker.
+Ascending keys sort NULLs first and descending keys NULLs last.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def ordering_for(sort_keys):
+    """Build ``order_by`` expressions matching the NULL placement used by the cursor filter."""
+    return [
+        F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_first=True)
+        for field, descending in sort_keys
+    ]
+
+
+def _value_of(instance, field):
+    value = instance
+    for part in field.split('__'):
+        try:
+            value = getattr(value, part)
+        except ObjectDoesNotExist:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def _after(field, descending, value):
+    """Rows strictly after ``value`` for one sort key, or None if there are none."""
+    if value is None:
+        # NULLs come first when ascending and last when descending
+        return None if descending else Q(**{f'{field}__isnull': False})
+    lookup = 'lt' if descending else 'gt'
+    condition = Q(**{f'{field}__{lookup}': value})
+    if descending:
+        condition |= Q(**{f'{field}__isnull': True})
+    return condition
+
+
+def _equal(field, value):
+    if value is None:
+        return Q(**{f'{field}__isnull': True})
+    return Q(**{field: value})
+
+
+def keyset_filter(sort_keys, values):
+    """Expand ``(k1, k2, ...) > (v1, v2, ...)`` into nested OR/AND conditions."""
+    condition = None
+    for (field, descending), value in reversed(list(zip(sort_keys, values))):
+        after = _after(field, descending, value)
+        if condition is None:
+            condition = after if after is not None else Q(pk__in=[])
+        else:
+            tail = _equal(field, value) & condition
+            condition = tail if after is None else (after | tail)
+    return condition
+
+
+class VehicleKeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.sort_name = view.get_sort_name()
+        self.sort_keys = view.get_sort_keys()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(keyset_filter(self.sort_keys, cursor))
+            except (TypeError, ValueError, ValidationError):
+                # Well-formed, but a value does not fit its field (e.g. "abc" for the id)
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset.order_by(*ordering_for(self.sort_keys))[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            sort_name, values = payload['s'], payload['v']
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if sort_name != self.sort_name or not isinstance(values, list) or len(values) != len(self.sort_keys):
+            raise NotFound(self.invalid_cursor_message)
+        # Sort keys are scalar columns; lists, objects and booleans never come from encode_cursor
+        if not all(value is None or (isinstance(value, (int, float, str)) and not isinstance(value, bool))
+                   for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, instance):
+        values = [_value_of(instance, field) for field, _ in self.sort_keys]
+        payload = json.dumps({'s': self.sort_name, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
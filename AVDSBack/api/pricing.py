@@ -0,0 +1,63 @@
+"""Stored vehicle prices.
+
+Prices used to be computed per query with Case/When annotations, which made
+price filters and sorts scan the whole catalog. They now live in the indexed
+``VehicleMetadata.price`` column and are kept in sync from here.
+"""
+from django.db import transaction
+
+from .models import VehicleDetail, VehicleMetadata
+
+DEFAULT_YEAR = 2000
+DEFAULT_ENGINE_CC = 2000
+
+
+def estimate_price(year, engine_cc):
+    # Formula: 20000 + (year - 1990) * 500 + (engine_cc || 2000) * 5
+    # Values may still be strings on instances built from CSV rows
+    year = int(year) if year not in (None, '') else DEFAULT_YEAR
+    engine_cc = int(engine_cc) if engine_cc not in (None, '') else DEFAULT_ENGINE_CC
+    return 20000 + (year - 1990) * 500 + engine_cc * 5
+
+
+def sync_vehicle_price(vehicle):
+    """Create or update the stored price for a single vehicle."""
+    price = estimate_price(vehicle.year, vehicle.engine_cc)
+    updated = VehicleMetadata.objects.filter(vehicle_id=vehicle.pk).update(price=price)
+    if not updated:
+        VehicleMetadata.objects.create(vehicle=vehicle, price=price)
+    return price
+
+
+def refresh_vehicle_prices(vehicle_ids=None, batch_size=1000):
+    """Recompute stored prices in bulk. Returns the number of vehicles touched."""
+    vehicles = VehicleDetail.objects.order_by('id')
+    if vehicle_ids is not None:
+        vehicles = vehicles.filter(id__in=vehicle_ids)
+
+    total = 0
+    batch = []
+    for row in vehicles.values_list('id', 'year', 'engine_cc').iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            total += _refresh_batch(batch)
+            batch = []
+    if batch:
+        total += _refresh_batch(batch)
+    return total
+
+
+def _refresh_batch(rows):
+    prices = {vehicle_id: estimate_price(year, engine_cc) for vehicle_id, year, engine_cc in rows}
+    with transaction.atomic():
+        existing = list(VehicleMetadata.objects.filter(vehicle_id__in=prices.keys()))
+        for metadata in existing:
+            metadata.price = prices[metadata.vehicle_id]
+        VehicleMetadata.objects.bulk_update(existing, ['price'])
+
+        seen = {metadata.vehicle_id for metadata in existing}
+        VehicleMetadata.objects.bulk_create([
+            VehicleMetadata(vehicle_id=vehicle_id, price=price)
+            for vehicle_id, price in prices.items() if vehicle_id not in seen
+        ])
+    return len(prices)
@@ -0,0 +1,141 @@
+"""Chat prompt assembly.
+
+The system prompt file is read once and reloaded only when its mtime
+changes. The system message and the ``/api/generate`` prefix built from it
+are prebuilt and shared between requests. Only the per-request part
+(history, context, message) is assembled each call. Each assembly sends
+``prompt_assembled`` (see api/signals.py) with its duration and size, and
+``ChatView`` reports the same figures in ``Server-Timing`` and
+``X-Prompt-Size``.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .signals import prompt_assembled
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for budgeting."""
+    return (len(text) + 3) // 4
+
+
+class SystemPrompt:
+    def __init__(self, path=None):
+        self._path = path
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._set_text(DEFAULT_SYSTEM_PROMPT)
+
+    @property
+    def path(self):
+        return self._path or getattr(
+            settings, 'CHAT_SYSTEM_PROMPT_PATH', os.path.join(settings.BASE_DIR, 'ai_system_prompt.txt')
+        )
+
+    def _set_text(self, text):
+        self.text = text
+        # Prebuilt, shared parts; callers must not mutate them
+        self.message = {'role': 'system', 'content': text}
+        self.generate_prefix = f"{text}\n\n"
+        self.tokens = estimate_tokens(text)
+        self.digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def refresh(self):
+        """Reload the file if its mtime changed. One ``stat`` per call otherwise."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return self
+        with self._lock:
+            if mtime != self._mtime:
+                text = DEFAULT_SYSTEM_PROMPT
+                if mtime is not None:
+                    try:
+                        with open(self.path, 'r', encoding='utf-8') as f:
+                            text = f.read()
+                    except FileNotFoundError:
+                        mtime = None
+                self._set_text(text)
+                self._mtime = mtime
+        return self
+
+
+system_prompt = SystemPrompt()
+
+
+@dataclass
+class AssembledPrompt:
+    messages: list
+    system_prompt: SystemPrompt
+    elapsed_ms: float
+    chars: int
+
+
+def build_messages(user_message, history=(), context=None, catalog=None):
+    """Messages for Ollama /api/chat: system prompt, history, then the user turn.
+
+    ``catalog`` is an optional block of matching vehicles (see api/retrieval.py)
+    appended to the user turn, so the prebuilt system message stays unchanged.
+    """
+    started = time.perf_counter()
+    prompt = system_prompt.refresh()
+
+    messages = [prompt.message]
+    chars = len(prompt.text)
+    for msg in history:
+        content = msg.get('content', '')
+        messages.append({'role': msg.get('role', 'user'), 'content': content})
+        chars += len(content)
+
+    context_str = f"\nContext: {context}" if context else ""
+    catalog_str = f"\n\n{catalog}" if catalog else ""
+    content = f"{user_message}{context_str}{catalog_str}"
+    messages.append({'role': 'user', 'content': content})
+    chars += len(content)
+
+    assembled = AssembledPrompt(messages, prompt, (time.perf_counter() - started) * 1000, chars)
+    prompt_assembled.send(
+        sender=SystemPrompt,
+        elapsed_ms=assembled.elapsed_ms,
+        chars=assembled.chars,
+        message_count=len(messages),
+        history_length=len(history),
+    )
+    return assembled
+
+
+def normalize_text(text):
+    return ' '.join(str(text).split())
+
+
+def cache_parts(prompt, user_message, history=(), context=None, catalog=None):
+    """Normalized inputs that determine a chat reply, for the response cache key."""
+    return [
+        prompt.system_prompt.digest,
+        context or {},
+        # Grounded and ungrounded (or differently grounded) replies differ
+        catalog or '',
+        [[msg.get('role', 'user'), normalize_text(msg.get('content', ''))] for msg in history],
+        normalize_text(user_message).lower(),
+    ]
+
+
+def build_generate_prompt(user_message, history=(), context=None, catalog=None):
+    """Flat prompt for Ollama /api/generate, reusing the prebuilt system prefix."""
+    parts = [system_prompt.refresh().generate_prefix]
+    for msg in history:
+        role = "User" if msg.get('role') == 'user' else "Assistant"
+        parts.append(f"{role}: {msg.get('content')}\n")
+    if catalog:
+        parts.append(f"{catalog}\n")
+    parts.append(f"Context: {context}\nUser: {user_message}\nAssistant:")
+    return ''.join(parts)
@@ -0,0 +1,186 @@
+"""Local copies of vehicle images that are only known by a remote ``image_url``.
+
+CSV imports reference images on third-party hosts. ``RemoteImageFetcher``
+downloads them with a bounded thread pool over one pooled ``requests``
+session (connect/read timeouts, retries with backoff, a size cap) and stores
+each file under ``vehicle_images/remote/`` named by its SHA-256. The same
+content is therefore stored once, whichever URLs point at it. The stored
+path is written to ``VehicleImage.image``, which the serializers already
+prefer over ``image_url``, and it goes through the usual variant rendering
+(see api/images.py). Network work happens in the pool. Database updates
+happen in the calling thread.
+"""
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import images
+from .background import submit_task
+from .caching import bump_vehicle_version
+from .models import VehicleImage
+
+# Pillow format -> stored file extension
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+_executor = None
+
+
+class RemoteImageError(Exception):
+    pass
+
+
+def pending_images():
+    """Images with a remote URL and no local file yet."""
+    return VehicleImage.objects.filter(image_url__isnull=False).exclude(image_url='').filter(
+        Q(image='') | Q(image__isnull=True)
+    )
+
+
+def cached_path(content_hash, extension):
+    return f'vehicle_images/remote/{content_hash[:2]}/{content_hash}.{extension}'
+
+
+# Striped locks so pool threads storing the same content take turns
+_store_locks = [threading.Lock() for _ in range(64)]
+
+
+def store_by_hash(content, content_hash, extension):
+    """Store ``content`` once under its hash path, whichever URL or thread fetched it. Returns the path."""
+    path = cached_path(content_hash, extension)
+    with _store_locks[int(content_hash[:8], 16) % len(_store_locks)]:
+        if default_storage.exists(path):
+            return path
+        saved = default_storage.save(path, ContentFile(content))
+    if saved != path:
+        # Another process stored the same content first; the storage added a suffix
+        default_storage.delete(saved)
+    return path
+
+
+class RemoteImageFetcher:
+    def __init__(self, workers=None, timeout=None, retries=None, max_bytes=None, session=None):
+        self.workers = workers or getattr(settings, 'REMOTE_IMAGE_WORKERS', 8)
+        self.timeout = timeout or getattr(settings, 'REMOTE_IMAGE_TIMEOUT', (3.05, 10))
+        self.retries = retries if retries is not None else getattr(settings, 'REMOTE_IMAGE_RETRIES', 2)
+        self.max_bytes = max_bytes or getattr(settings, 'REMOTE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+        self.session = session or self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=('GET',),
+        )
+        # One keep-alive connection per worker and host
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=self.workers, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def download(self, url):
+        """Fetch ``url`` and store it by content hash. Returns (path, content_hash)."""
+        from PIL import Image
+
+        if not url.lower().startswith(('http://', 'https://')):
+            raise RemoteImageError(f'Unsupported URL: {url}')
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                buffer = io.BytesIO()
+                for block in response.iter_content(64 * 1024):
+                    buffer.write(block)
+                    if buffer.tell() > self.max_bytes:
+                        raise RemoteImageError(f'{url} is larger than {self.max_bytes} bytes')
+        except requests.RequestException as e:
+            raise RemoteImageError(f'{url}: {e}') from e
+
+        content = buffer.getvalue()
+        try:
+            image_format = Image.open(io.BytesIO(content)).format
+        except Exception as e:
+            raise RemoteImageError(f'{url} is not an image') from e
+        if image_format not in IMAGE_EXTENSIONS:
+            raise RemoteImageError(f'{url}: unsupported image format {image_format}')
+
+        content_hash = hashlib.sha256(content).hexdigest()
+        return store_by_hash(content, content_hash, IMAGE_EXTENSIONS[image_format]), content_hash
+
+    def _download_or_error(self, url):
+        try:
+            return url, self.download(url), None
+        except Exception as e:
+            return url, None, str(e)
+
+    def cache_images(self, queryset=None):
+        """Download every pending image in ``queryset`` and point the rows at the local copies.
+
+        Each distinct URL is fetched once. Returns counts of ``cached`` rows,
+        ``downloaded`` URLs and ``failed`` URLs, plus the first errors.
+        """
+        queryset = pending_images() if queryset is None else queryset
+        by_url = {}
+        for pk, vehicle_id, url in queryset.values_list('pk', 'vehicle_id', 'image_url'):
+            by_url.setdefault(url, []).append((pk, vehicle_id))
+
+        stats = {'cached': 0, 'downloaded': 0, 'failed': 0, 'errors': []}
+        if not by_url:
+            return stats
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='remote-image') as pool:
+            for url, stored, error in pool.map(self._download_or_error, by_url):
+                if error:
+                    stats['failed'] += 1
+                    if len(stats['errors']) < 20:
+                        stats['errors'].append(error)
+                    continue
+                path, content_hash = stored
+                rows = by_url[url]
+                VehicleImage.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+                    image=path, content_hash=content_hash
+                )
+                stats['downloaded'] += 1
+                stats['cached'] += len(rows)
+                # update() skips post_save, so refresh cached payloads and render variants here
+                for pk, vehicle_id in rows:
+                    bump_vehicle_version(vehicle_id)
+                    images.queue_variants(pk)
+        return stats
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # A single runner; each batch is parallelised by RemoteImageFetcher
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='remote-images')
+    return _executor
+
+
+def queue_remote_images(image_ids=None, vehicle_ids=None):
+    """Cache the pending remote images of the given images or vehicles once the transaction commits."""
+    if not getattr(settings, 'REMOTE_IMAGE_CACHE', True):
+        return
+    # Failed images stay on their remote URL; cache_remote_images retries them
+    transaction.on_commit(lambda: submit_task(
+        get_executor(), 'Caching remote images', _cache_queued, image_ids, vehicle_ids
+    ))
+
+
+def _cache_queued(image_ids, vehicle_ids):
+    queryset = pending_images()
+    if image_ids is not None:
+        queryset = queryset.filter(pk__in=image_ids)
+    if vehicle_ids is not None:
+        queryset = queryset.filter(vehicle_id__in=vehicle_ids)
+    return RemoteImageFetcher().cache_images(queryset)
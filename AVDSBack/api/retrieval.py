@@ -0,0 +1,251 @@
+"""Catalog-grounded context for the chatbot.
+
+The user's message is matched against the reference tables (make, model,
+body and drive type names, held in memory and rebuilt when their table
+versions move) and scanned for years and prices ("under 30k", "after 2015").
+The matches become filters on indexed columns (foreign keys,
+``VehicleMetadata.price``), and the top rows are fetched in one query and
+packed into a compact block that stays under a token budget. Messages with
+no recognisable terms get no block.
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+from django.conf import settings
+
+from .caching import table_versions
+from .models import Body, DriveType, Make, MakeModel, VehicleDetail
+from .prompts import estimate_tokens
+
+VOCABULARY_MODELS = (Make, MakeModel, Body, DriveType)
+
+# Longest reference name, in words, that is looked up as one phrase
+MAX_PHRASE_WORDS = 4
+
+YEAR_RE = re.compile(r'\b(19[5-9]\d|20[0-4]\d)\b')
+AMOUNT = r'\$?\s*(\d+(?:[.,]\d+)?)\s*(k|K|000)?'
+PRICE_MAX_RE = re.compile(r'\b(?:under|below|less than|cheaper than|max(?:imum)?|up to|within)\s+' + AMOUNT)
+PRICE_MIN_RE = re.compile(r'\b(?:over|above|more than|at least|min(?:imum)?|from)\s+' + AMOUNT)
+PRICE_RANGE_RE = re.compile(r'\bbetween\s+' + AMOUNT + r'\s+(?:and|to)\s+' + AMOUNT)
+YEAR_RANGE_RE = re.compile(r'\b(?:from|between)\s+(19[5-9]\d|20[0-4]\d)\s+(?:to|and|-)\s+(19[5-9]\d|20[0-4]\d)\b')
+YEAR_MIN_RE = re.compile(r'\b(?:after|since|newer than|from)\s+(19[5-9]\d|20[0-4]\d)\b')
+YEAR_MAX_RE = re.compile(r'\b(?:before|older than|until|up to)\s+(19[5-9]\d|20[0-4]\d)\b')
+
+
+def _amount(number, suffix):
+    # "30k", "30,000", "$30000", "2.5k"
+    value = float(number.replace(',', ''))
+    if suffix:
+        value *= 1000
+    return int(value)
+
+
+def _is_price(number, suffix, text_match):
+    # Bare four-digit numbers in the year range are years, not prices
+    if suffix or '$' in text_match:
+        return True
+    value = _amount(number, suffix)
+    return not (1950 <= value <= 2049) and value >= 1000
+
+
+@dataclass
+class CatalogQuery:
+    make_ids: List[int] = field(default_factory=list)
+    model_ids: List[int] = field(default_factory=list)
+    body_ids: List[int] = field(default_factory=list)
+    drive_type_ids: List[int] = field(default_factory=list)
+    year: int = None
+    min_year: int = None
+    max_year: int = None
+    min_price: int = None
+    max_price: int = None
+
+    def __bool__(self):
+        return any(value not in (None, []) for value in vars(self).values())
+
+
+class Vocabulary:
+    """Lower-cased reference names mapped to their IDs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = None
+        self.makes = self.models = self.bodies = self.drive_types = {}
+        self.model_makes = {}
+
+    def current(self):
+        versions = table_versions(VOCABULARY_MODELS)
+        if versions != self._versions:
+            with self._lock:
+                if versions != self._versions:
+                    self._build()
+                    self._versions = versions
+        return self
+
+    def _build(self):
+        def names(rows):
+            mapping = {}
+            for pk, name in rows:
+                key = ' '.join((name or '').lower().split())
+                if key:
+                    mapping.setdefault(key, []).append(pk)
+            return mapping
+
+        self.makes = names(Make.objects.values_list('make_id', 'make_name'))
+        self.bodies = names(Body.objects.values_list('body_id', 'body_name'))
+        self.drive_types = names(DriveType.objects.values_list('drive_type_id', 'drive_type_name'))
+        models = MakeModel.objects.values_list('model_id', 'model_name', 'make_id')
+        self.model_makes = {}
+        rows = []
+        for pk, name, make_id in models.iterator():
+            self.model_makes[pk] = make_id
+            rows.append((pk, name))
+        self.models = names(rows)
+
+
+vocabulary = Vocabulary()
+
+
+def parse_message(message):
+    """Turn a free-text question into a CatalogQuery."""
+    text = ' '.join((message or '').lower().split())
+    query = CatalogQuery()
+    if not text:
+        return query
+
+    # Reference names, longest phrase first so "land rover" wins over "rover"
+    vocab = vocabulary.current()
+    # Inner dots and dashes stay ("e-class", "3.5l"); sentence punctuation does not
+    words = re.findall(r"\w[\w\-\.]*\w|\w", text)
+    used = set()
+    for size in range(MAX_PHRASE_WORDS, 0, -1):
+        for start in range(len(words) - size + 1):
+            span = range(start, start + size)
+            if used.intersection(span):
+                continue
+            phrase = ' '.join(words[start:start + size])
+            # Numbers are years and prices; short plain words ("is", "to") are too ambiguous
+            if phrase.isdigit() or (len(phrase) < 3 and phrase.isalpha()):
+                continue
+            for mapping, ids in (
+                (vocab.makes, query.make_ids),
+                (vocab.models, query.model_ids),
+                (vocab.bodies, query.body_ids),
+                (vocab.drive_types, query.drive_type_ids),
+            ):
+                if phrase in mapping:
+                    ids.extend(mapping[phrase])
+                    used.update(span)
+                    break
+            else:
+                # Plural body types ("suvs", "sedans")
+                if phrase.endswith('s') and phrase[:-1] in vocab.bodies:
+                    query.body_ids.extend(vocab.bodies[phrase[:-1]])
+                    used.update(span)
+
+    # A model name shared by several makes is narrowed to the makes mentioned
+    if query.make_ids and query.model_ids:
+        query.model_ids = [pk for pk in query.model_ids if vocab.model_makes.get(pk) in query.make_ids]
+        if query.model_ids:
+            query.make_ids = []
+
+    # Prices
+    match = PRICE_RANGE_RE.search(text)
+    if match:
+        query.min_price = _amount(match.group(1), match.group(2))
+        query.max_price = _amount(match.group(3), match.group(4))
+    else:
+        for regex, attr in ((PRICE_MAX_RE, 'max_price'), (PRICE_MIN_RE, 'min_price')):
+            for match in regex.finditer(text):
+                if _is_price(match.group(1), match.group(2), match.group(0)):
+                    setattr(query, attr, _amount(match.group(1), match.group(2)))
+                    break
+
+    # Years
+    match = YEAR_RANGE_RE.search(text)
+    if match:
+        query.min_year, query.max_year = sorted((int(match.group(1)), int(match.group(2))))
+    else:
+        match = YEAR_MIN_RE.search(text)
+        if match:
+            query.min_year = int(match.group(1))
+        match = YEAR_MAX_RE.search(text)
+        if match:
+            query.max_year = int(match.group(1))
+    if query.min_year is None and query.max_year is None:
+        years = sorted({int(year) for year in YEAR_RE.findall(text)})
+        if len(years) == 1:
+            query.year = years[0]
+        elif len(years) > 1:
+            query.min_year, query.max_year = years[0], years[-1]
+    return query
+
+
+def find_vehicles(query, limit):
+    queryset = VehicleDetail.objects.all()
+    if query.model_ids:
+        queryset = queryset.filter(model_id__in=query.model_ids)
+    elif query.make_ids:
+        queryset = queryset.filter(make_id__in=query.make_ids)
+    if query.body_ids:
+        queryset = queryset.filter(body_id__in=query.body_ids)
+    if query.drive_type_ids:
+        queryset = queryset.filter(drive_type_id__in=query.drive_type_ids)
+    if query.year:
+        queryset = queryset.filter(year=query.year)
+    if query.min_year:
+        queryset = queryset.filter(year__gte=query.min_year)
+    if query.max_year:
+        queryset = queryset.filter(year__lte=query.max_year)
+    if query.min_price:
+        queryset = queryset.filter(metadata__price__gte=query.min_price)
+    if query.max_price:
+        queryset = queryset.filter(metadata__price__lte=query.max_price)
+    # Newest first, cheapest first within a year
+    return list(queryset.order_by('-year', 'metadata__price', 'id').values_list(
+        'id', 'make__make_name', 'model__model_name', 'year', 'body__body_name',
+        'drive_type__drive_type_name', 'engine', 'metadata__price',
+    )[:limit])
+
+
+def format_vehicle(row):
+    pk, make, model, year, body, drive_type, engine, price = row
+    price = f'${price:,}' if price is not None else '-'
+    return ' | '.join(str(value) if value not in (None, '') else '-' for value in (
+        pk, f'{make} {model}', year, body, drive_type, engine, price,
+    ))
+
+
+@dataclass
+class CatalogContext:
+    text: str
+    vehicle_ids: List[int]
+    tokens: int
+
+
+def build_catalog_context(message, limit=None, token_budget=None):
+    """Compact block of catalog rows matching ``message``, or None."""
+    limit = limit or getattr(settings, 'CHAT_CONTEXT_VEHICLES', 8)
+    token_budget = token_budget or getattr(settings, 'CHAT_CONTEXT_TOKENS', 400)
+
+    query = parse_message(message)
+    if not query:
+        return None
+
+    header = 'Catalog matches (id | vehicle | year | body | drive | engine | price):'
+    lines, vehicle_ids = [header], []
+    tokens = estimate_tokens(header)
+    for row in find_vehicles(query, limit):
+        line = f'- {format_vehicle(row)}'
+        line_tokens = estimate_tokens(line) + 1
+        if tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        vehicle_ids.append(row[0])
+        tokens += line_tokens
+    if not vehicle_ids:
+        lines.append('- none in stock')
+        tokens += estimate_tokens(lines[-1]) + 1
+    return CatalogContext('\n'.join(lines), vehicle_ids, tokens)
@@ -0,0 +1,109 @@
+"""Full-text vehicle search backed by an SQLite FTS5 index.
+
+The ``vehicle_search`` virtual table holds one row per vehicle (rowid is the
+vehicle ID) with the display name, make, model and metadata text. It is kept
+in sync by the signal handlers in ``api/signals.py`` and can be rebuilt with
+``python manage.py rebuild_search_index``. On databases without FTS5 the
+search falls back to ``icontains`` lookups.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'vehicle_search'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "display_name, make_name, model_name, custom_title, description, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+DROP_SQL = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+POPULATE_SQL = (
+    f"INSERT INTO {SEARCH_TABLE} (rowid, display_name, make_name, model_name, custom_title, description) "
+    'SELECT v."ID", v."Vehicle_Display_Name", mk."Make", mm."ModelName", md.custom_title, md.description '
+    'FROM "VehicleDetails" v '
+    'LEFT JOIN "Makes" mk ON mk."MakeID" = v."MakeID" '
+    'LEFT JOIN "MakeModels" mm ON mm."ModelID" = v."ModelID" '
+    'LEFT JOIN api_vehiclemetadata md ON md.vehicle_id = v."ID"'
+)
+
+# SQLite limits the number of bound parameters per statement
+BATCH_SIZE = 500
+
+_available = None
+
+
+def fts_available():
+    """Whether the FTS index exists on the default database (cached per process)."""
+    global _available
+    if _available is None:
+        _available = (
+            connection.vendor == 'sqlite'
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available
+
+
+def build_match_query(q):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = re.findall(r'\w+', q or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def filter_queryset(queryset, q, rank=False):
+    """Restrict a VehicleDetail queryset to rows matching ``q``.
+
+    With ``rank=True`` the index is joined once and its bm25 ``rank`` (lower is
+    more relevant) is exposed as the ``search_rank`` annotation, so callers can
+    order and paginate by relevance without re-running the MATCH per row.
+    """
+    match = build_match_query(q)
+    if not match or not fts_available():
+        queryset = queryset.filter(
+            Q(vehicle_display_name__icontains=q) |
+            Q(make__make_name__icontains=q) |
+            Q(model__model_name__icontains=q)
+        )
+        return queryset.annotate(search_rank=Value(0)) if rank else queryset
+
+    if rank:
+        return queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.rowid = "VehicleDetails"."ID"', f'{SEARCH_TABLE} MATCH %s'],
+            params=[match],
+        ).annotate(search_rank=RawSQL(f'{SEARCH_TABLE}.rank', []))
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match])
+    )
+
+
+def index_vehicles(vehicle_ids):
+    """Re-index the given vehicles, dropping rows for vehicles that no longer exist."""
+    if not fts_available():
+        return
+    vehicle_ids = list(vehicle_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(vehicle_ids), BATCH_SIZE):
+            batch = vehicle_ids[start:start + BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch)
+            cursor.execute(f'{POPULATE_SQL} WHERE v."ID" IN ({placeholders})', batch)
+
+
+def rebuild_index():
+    """Drop and repopulate the whole index. Returns the number of indexed vehicles."""
+    global _available
+    if connection.vendor != 'sqlite' or 'VehicleDetails' not in connection.introspection.table_names():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_SQL)
+        cursor.execute(CREATE_SQL)
+        cursor.execute(POPULATE_SQL)
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+        total = cursor.fetchone()[0]
+    _available = True
+    return total
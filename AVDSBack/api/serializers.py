@@ -3,6 +3,7 @@ from .models import Make, MakeModel, Body, DriveType, VehicleDetail, VehicleImag
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.models import User
 from django.db.models import Q
+from .images import image_size, image_url, variant_urls
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -46,6 +47,13 @@ class DriveTypeSerializer(serializers.ModelSerializer):
         model = DriveType
         fields = '__all__'
 
+def parse_field_list(value):
+    """Split a comma separated query parameter into a set of names (None if absent)."""
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
 class VehicleDetailSerializer(serializers.ModelSerializer):
     make_name = serializers.CharField(source='make.make_name', read_only=True)
     model_name = serializers.CharField(source='model.model_name', read_only=True)
@@ -54,42 +62,138 @@ class VehicleDetailSerializer(serializers.ModelSerializer):
     reviews = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
     image_data = serializers.SerializerMethodField()
+    primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
     description = serializers.SerializerMethodField()
     custom_title = serializers.SerializerMethodField()
+    price = serializers.SerializerMethodField()
+
+    # Fields that embed related rows; ?embed= picks which of them to include
+    EMBEDS = ('reviews', 'images', 'image_data', 'primary_image', 'primary_image_variants')
+
+    # Relation each field reads from, so unused relations are never loaded
+    FIELD_RELATIONS = {
+        'make_name': 'make',
+        'model_name': 'model',
+        'body_name': 'body',
+        'drive_type_name': 'drive_type',
+        'description': 'metadata',
+        'custom_title': 'metadata',
+        'price': 'metadata',
+        'images': 'images',
+        'image_data': 'images',
+        'primary_image': 'images',
+        'primary_image_variants': 'images',
+        'reviews': 'reviews',
+    }
 
     class Meta:
         model = VehicleDetail
         fields = '__all__'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            for name in list(self.fields):
+                if not self.is_requested(name, request.query_params):
+                    self.fields.pop(name)
+
+    @classmethod
+    def is_requested(cls, name, params):
+        """Apply ?fields= (sparse fieldset) and ?embed= (related rows) to one field name."""
+        fields = parse_field_list(params.get('fields')) if params is not None else None
+        embed = parse_field_list(params.get('embed')) if params is not None else None
+        if name in cls.EMBEDS and embed is not None:
+            return name in embed
+        return fields is None or name in fields
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, params=None):
+        """Load the relations the requested fields touch in a fixed number of queries."""
+        from django.db.models import Prefetch
+        from .models import Review
+
+        relations = {
+            relation for name, relation in cls.FIELD_RELATIONS.items()
+            if cls.is_requested(name, params)
+        }
+        select = [relation for relation in ('make', 'model', 'body', 'drive_type', 'metadata') if relation in relations]
+        if select:
+            queryset = queryset.select_related(*select)
+        if 'images' in relations:
+            queryset = queryset.prefetch_related(
+                Prefetch('images', queryset=VehicleImage.objects.order_by('-is_primary', '-created_at'))
+            )
+        if 'reviews' in relations:
+            queryset = queryset.prefetch_related(
+                Prefetch('reviews', queryset=Review.objects.select_related('user'))
+            )
+        return queryset
+
+    def _get_images(self, obj):
+        # Served from the prefetch cache when the queryset was eager loaded
+        if 'images' in getattr(obj, '_prefetched_objects_cache', {}):
+            return obj.images.all()
+        return obj.images.all().order_by('-is_primary', '-created_at')
+
+    def _get_metadata(self, obj):
+        try:
+            return obj.metadata
+        except VehicleMetadata.DoesNotExist:
+            return None
+
     def get_reviews(self, obj):
         # Import here to avoid circular import if ReviewSerializer is below
         from .serializers import ReviewSerializer
         return ReviewSerializer(obj.reviews.all(), many=True).data
 
+    def _image_size(self):
+        # ?image_width=640&image_format=webp picks a resized copy (see api/images.py);
+        # card endpoints pass a default_image_width in the context
+        return image_size(self.context.get('request'), self.context.get('default_image_width'))
+
     def get_images(self, obj):
         # Return existing images
-        images = obj.images.all().order_by('-is_primary', '-created_at')
-        return [image.image.url if image.image else image.image_url for image in images]
+        width, image_format = self._image_size()
+        return [image_url(image, width, image_format) for image in self._get_images(obj)]
 
     def get_image_data(self, obj):
         # Return existing images data
-        images = obj.images.all().order_by('-is_primary', '-created_at')
-        return VehicleImageSerializer(images, many=True).data
+        return VehicleImageSerializer(self._get_images(obj), many=True).data
 
-    def get_description(self, obj):
-        if hasattr(obj, 'metadata'):
-            return obj.metadata.description
+    def get_primary_image(self, obj):
+        width, image_format = self._image_size()
+        for image in self._get_images(obj):
+            return image_url(image, width, image_format)
         return None
 
-    def get_custom_title(self, obj):
-        if hasattr(obj, 'metadata'):
-            return obj.metadata.custom_title
+    def get_primary_image_variants(self, obj):
+        for image in self._get_images(obj):
+            return variant_urls(image)
         return None
 
+    def get_description(self, obj):
+        metadata = self._get_metadata(obj)
+        return metadata.description if metadata else None
+
+    def get_custom_title(self, obj):
+        metadata = self._get_metadata(obj)
+        return metadata.custom_title if metadata else None
+
+    def get_price(self, obj):
+        metadata = self._get_metadata(obj)
+        return metadata.price if metadata else None
+
 class VehicleImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = VehicleImage
-        fields = ('id', 'vehicle', 'image', 'image_url', 'is_primary', 'created_at')
+        fields = ('id', 'vehicle', 'image', 'image_url', 'is_primary', 'variants', 'created_at')
+
+    def get_variants(self, obj):
+        return variant_urls(obj)
 
 class VehicleMetadataSerializer(serializers.ModelSerializer):
     class Meta:
@@ -153,3 +257,31 @@ class HomepageFeatureSerializer(serializers.ModelSerializer):
     class Meta:
         model = HomepageFeature
         fields = '__all__'
+
+from .models import ImportJob
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'original_name', 'status', 'rows_done', 'imported_count',
+            'makes_created', 'models_created', 'error_count', 'errors',
+            'elapsed_seconds', 'rows_per_second', 'message',
+            'created_at', 'updated_at', 'finished_at',
+        ]
+
+from .models import ChatSession, ChatTurn
+
+class ChatTurnSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatTurn
+        fields = ('id', 'role', 'content', 'created_at')
+
+class ChatSessionSerializer(serializers.ModelSerializer):
+    turns = ChatTurnSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ChatSession
+        fields = ('id', 'summary', 'turns', 'created_at', 'updated_at')
@@ -0,0 +1,231 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import images, remote_images, search, stats
+from .caching import bump_catalog_version, bump_table_version, bump_vehicle_version
+from .models import (
+    Body, DriveType, HomepageFeature, Make, MakeModel, Review, VehicleDetail, VehicleImage, VehicleMetadata,
+)
+from .pricing import refresh_vehicle_prices, sync_vehicle_price
+from .suggestions import suggestion_index
+
+SEARCHABLE_METADATA_FIELDS = {'description', 'custom_title'}
+
+# Sent by the bulk importer after each committed chunk, since bulk_create
+# skips post_save. Arguments: vehicle_ids, makes, models, vehicles.
+vehicles_imported = Signal()
+
+# Sent by api/prompts.py after each chat prompt is assembled, for
+# instrumentation. Arguments: elapsed_ms, chars, message_count, history_length.
+prompt_assembled = Signal()
+
+
+@receiver(post_save, sender=VehicleDetail)
+def update_vehicle_price(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_vehicle_price(instance)
+
+
+@receiver(post_save, sender=VehicleDetail)
+@receiver(post_delete, sender=VehicleDetail)
+def index_vehicle(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_vehicles([instance.pk])
+
+
+@receiver(post_save, sender=VehicleMetadata)
+@receiver(post_delete, sender=VehicleMetadata)
+def index_vehicle_metadata(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # Skip saves that cannot change searchable text (e.g. view counters)
+    if update_fields is not None and not SEARCHABLE_METADATA_FIELDS.intersection(update_fields):
+        return
+    if created and not (instance.description or instance.custom_title):
+        return
+    search.index_vehicles([instance.vehicle_id])
+
+
+@receiver(post_save, sender=Make)
+def index_make_vehicles(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    search.index_vehicles(VehicleDetail.objects.filter(make_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=MakeModel)
+def index_model_vehicles(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    search.index_vehicles(VehicleDetail.objects.filter(model_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=VehicleDetail)
+@receiver(post_delete, sender=VehicleDetail)
+@receiver(post_save, sender=Make)
+@receiver(post_delete, sender=Make)
+@receiver(post_save, sender=MakeModel)
+@receiver(post_delete, sender=MakeModel)
+@receiver(post_save, sender=Body)
+@receiver(post_delete, sender=Body)
+@receiver(post_save, sender=DriveType)
+@receiver(post_delete, sender=DriveType)
+def invalidate_catalog(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=VehicleMetadata)
+@receiver(post_delete, sender=VehicleMetadata)
+def invalidate_catalog_metadata(sender, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # View counter updates do not change any filterable value
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=VehicleImage)
+@receiver(post_delete, sender=VehicleImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_vehicle(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Images and reviews only change the vehicle's own payload, not list membership
+    bump_vehicle_version(instance.vehicle_id)
+
+
+@receiver(post_save, sender=VehicleImage)
+def render_image_variants(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    # Uploaded files get resized copies in the background
+    if created or not instance.variants:
+        images.queue_variants(instance.pk)
+
+
+@receiver(post_save, sender=VehicleImage)
+def cache_remote_image(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.image or not instance.image_url:
+        return
+    # Images known only by a third-party URL are downloaded in the background
+    remote_images.queue_remote_images(image_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=VehicleImage)
+def delete_image_variants(sender, instance, **kwargs):
+    images.delete_variants(instance)
+
+
+@receiver(post_save, sender=VehicleDetail)
+@receiver(post_delete, sender=VehicleDetail)
+def invalidate_vehicle_detail(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_vehicle_version(instance.pk)
+
+
+@receiver(post_save, sender=VehicleMetadata)
+@receiver(post_delete, sender=VehicleMetadata)
+def invalidate_vehicle_metadata(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    bump_vehicle_version(instance.vehicle_id)
+
+
+@receiver(post_save, sender=Make)
+@receiver(post_delete, sender=Make)
+@receiver(post_save, sender=MakeModel)
+@receiver(post_delete, sender=MakeModel)
+@receiver(post_save, sender=Body)
+@receiver(post_delete, sender=Body)
+@receiver(post_save, sender=DriveType)
+@receiver(post_delete, sender=DriveType)
+@receiver(post_save, sender=HomepageFeature)
+@receiver(post_delete, sender=HomepageFeature)
+def invalidate_table(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_table_version(sender)
+
+
+@receiver(post_save, sender=Make)
+@receiver(post_delete, sender=Make)
+def update_make_suggestions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    suggestion_index.queue('make', instance.pk, instance.make_name, deleted=kwargs['signal'] is post_delete)
+
+
+@receiver(post_save, sender=MakeModel)
+@receiver(post_delete, sender=MakeModel)
+def update_model_suggestions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    suggestion_index.queue(
+        'model', instance.pk, instance.model_name, make_id=instance.make_id,
+        deleted=kwargs['signal'] is post_delete,
+    )
+
+
+@receiver(post_save, sender=VehicleDetail)
+@receiver(post_delete, sender=VehicleDetail)
+def update_vehicle_suggestions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    suggestion_index.queue(
+        'vehicle', instance.pk, instance.vehicle_display_name,
+        deleted=kwargs['signal'] is post_delete,
+    )
+
+
+@receiver(post_save, sender=VehicleDetail)
+@receiver(post_delete, sender=VehicleDetail)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def count_dashboard_rows(sender, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    if kwargs['signal'] is post_delete:
+        delta = -1
+    elif created:
+        delta = 1
+    else:
+        return
+    name = {VehicleDetail: 'total_vehicles', User: 'total_users', Review: 'total_reviews'}[sender]
+    stats.adjust_counter(name, delta)
+
+
+@receiver(vehicles_imported)
+def sync_imported_vehicles(sender, vehicle_ids, makes, models, vehicles, **kwargs):
+    refresh_vehicle_prices(vehicle_ids)
+    search.index_vehicles(vehicle_ids)
+
+    for make in makes:
+        suggestion_index.queue('make', make.pk, make.make_name)
+    for model in models:
+        suggestion_index.queue('model', model.pk, model.model_name, make_id=model.make_id)
+    for vehicle in vehicles:
+        suggestion_index.queue('vehicle', vehicle.pk, vehicle.vehicle_display_name)
+
+    # bulk_create skips post_save, so imported image URLs are queued here
+    remote_images.queue_remote_images(vehicle_ids=vehicle_ids)
+
+    # bulk_create skips post_save, so the dashboard counter is adjusted here
+    stats.adjust_counter('total_vehicles', len(vehicle_ids))
+
+    if makes:
+        bump_table_version(Make)
+    if models:
+        bump_table_version(MakeModel)
+    bump_catalog_version()
@@ -0,0 +1,120 @@
+"""Precomputed figures for the admin dashboard.
+
+``AdminStatsView`` used to count vehicles, users and reviews and rank the
+search analytics on every load. The figures now live in ``StatsRollup``,
+one row each, so the dashboard reads a handful of rows whatever the table
+sizes.
+
+Counters are kept current incrementally. Signal handlers add or subtract
+one on create and delete, and imports add their batch size. ``refresh_stats``
+recounts everything and re-ranks the top searches. It runs from
+``manage.py refresh_admin_stats`` (cron) and, when the last recount is older
+than ``ADMIN_STATS_MAX_AGE``, in the background after a dashboard load. The
+response's ``refreshed_at`` says when that last recount happened.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .analytics import search_analytics_buffer
+from .background import submit_task
+from .models import Review, SearchAnalytics, StatsRollup, VehicleDetail
+from .serializers import SearchAnalyticsSerializer
+
+COUNTERS = {
+    'total_vehicles': VehicleDetail,
+    'total_users': User,
+    'total_reviews': Review,
+}
+
+# Name: (window, number of queries kept)
+SEARCH_RANKINGS = {
+    'daily_searches': (timedelta(days=1), 5),
+    'monthly_searches': (timedelta(days=30), 10),
+}
+
+_executor = None
+_refreshing = False
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='admin-stats')
+    return _executor
+
+
+def max_age():
+    return getattr(settings, 'ADMIN_STATS_MAX_AGE', 300)
+
+
+def adjust_counter(name, delta):
+    """Add ``delta`` to a counter. Rows that do not exist yet are left to the next refresh."""
+    if delta:
+        StatsRollup.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def top_searches(window, limit):
+    queryset = SearchAnalytics.objects.filter(
+        last_searched__gte=timezone.now() - window
+    ).order_by('-count')[:limit]
+    return SearchAnalyticsSerializer(queryset, many=True).data
+
+
+def refresh_stats():
+    """Recount every figure and return them as ``get_stats()`` does."""
+    search_analytics_buffer.flush()
+    now = timezone.now()
+    with transaction.atomic():
+        for name, model in COUNTERS.items():
+            StatsRollup.objects.update_or_create(
+                name=name, defaults={'value': model.objects.count(), 'data': [], 'refreshed_at': now}
+            )
+        for name, (window, limit) in SEARCH_RANKINGS.items():
+            StatsRollup.objects.update_or_create(
+                name=name, defaults={'value': 0, 'data': top_searches(window, limit), 'refreshed_at': now}
+            )
+    return get_stats()
+
+
+def get_stats():
+    """Dashboard figures from the rollup table, or None if it was never filled."""
+    rows = {row.name: row for row in StatsRollup.objects.filter(name__in=[*COUNTERS, *SEARCH_RANKINGS])}
+    if len(rows) < len(COUNTERS) + len(SEARCH_RANKINGS):
+        return None
+    stats = {name: rows[name].value for name in COUNTERS}
+    stats.update({name: rows[name].data for name in SEARCH_RANKINGS})
+    stats['refreshed_at'] = min(row.refreshed_at for row in rows.values())
+    return stats
+
+
+def queue_refresh():
+    global _refreshing
+    if _refreshing:
+        return
+    _refreshing = True
+    # On failure the stale figures are served until the next attempt
+    transaction.on_commit(lambda: submit_task(get_executor(), 'Refreshing admin stats', _refresh_queued))
+
+
+def _refresh_queued():
+    global _refreshing
+    try:
+        return refresh_stats()
+    finally:
+        _refreshing = False
+
+
+def dashboard_stats():
+    """Figures for ``AdminStatsView``: rollup rows, refreshed in the background when stale."""
+    stats = get_stats()
+    if stats is None:
+        return refresh_stats()
+    if stats['refreshed_at'] < timezone.now() - timedelta(seconds=max_age()):
+        queue_refresh()
+    return stats
@@ -0,0 +1,219 @@
+"""In-memory prefix index for search-as-you-type suggestions.
+
+Every word position of every make name, model name and vehicle display name
+is stored as a lower-cased key in one sorted list, so a keystroke is a binary
+search plus a short scan instead of an ``icontains`` query. The index is
+built on first use, kept current by the signal handlers in ``api/signals.py``
+(changes are queued and merged in on the next lookup) and rebuilt after
+``SUGGESTIONS_MAX_AGE`` seconds to pick up changes made by other processes.
+That rebuild runs in one background thread at a time while lookups keep
+using the current index.
+
+A published index is never modified. Queued changes are merged into a copy
+outside the lock, and the copy is swapped in under it, so a lookup never
+waits for a large import to be merged and never sees a half-applied batch.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .background import run_task
+from .models import Make, MakeModel, VehicleDetail
+
+# Result ordering: makes first, then models, then individual vehicles
+KIND_RANK = {'make': 0, 'model': 1, 'vehicle': 2}
+
+MAX_LIMIT = 20
+
+# Batches with at most this many key changes are bisected into a copy of the
+# key list; larger ones are merged in one pass
+BISECT_MAX_CHANGES = 64
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def word_keys(label):
+    """Keys for every word start, e.g. 'toyota camry 2001', 'camry 2001', '2001'."""
+    words = normalize(label).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class IndexState(NamedTuple):
+    keys: list       # sorted [(key, kind_rank, id)]
+    labels: dict     # (kind, id) -> label
+    make_ids: dict   # model id -> make id
+
+
+def apply_changes(state, changed):
+    """A new IndexState with ``changed`` ((kind, id) -> (label, make_id) or None) applied."""
+    labels, make_ids = dict(state.labels), dict(state.make_ids)
+    removed, added = set(), set()
+    for (kind, pk), value in changed.items():
+        rank = KIND_RANK[kind]
+        old_label = labels.pop((kind, pk), None)
+        old_keys = {(key, rank, pk) for key in word_keys(old_label)} if old_label is not None else set()
+        new_keys = set()
+        if value is not None:
+            label, make_id = value
+            labels[(kind, pk)] = label
+            if kind == 'model':
+                make_ids[pk] = make_id
+            new_keys = {(key, rank, pk) for key in word_keys(label)}
+        # Words shared by the old and new label keep their entries
+        removed |= old_keys - new_keys
+        added |= new_keys - old_keys
+
+    if len(removed) + len(added) <= BISECT_MAX_CHANGES:
+        keys = list(state.keys)
+        for entry in removed:
+            i = bisect_left(keys, entry)
+            if i < len(keys) and keys[i] == entry:
+                del keys[i]
+        for entry in added:
+            insort(keys, entry)
+    else:
+        kept = [entry for entry in state.keys if entry not in removed] if removed else state.keys
+        keys = list(heapq.merge(kept, sorted(added)))
+    return IndexState(keys, labels, make_ids)
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for the whole of a build so only one runs at a time
+        self._build_lock = threading.Lock()
+        # Held while one request merges queued changes into a copy
+        self._apply_lock = threading.Lock()
+        self._state = IndexState([], {}, {})
+        self._pending = {}     # (kind, id) -> (label, make_id) or None for deletions
+        # Changes queued while a build runs; they may be missing from the rows
+        # it read, so they are applied again on top of the new index
+        self._build_changes = None
+        self._built_at = None
+
+    def get_max_age(self):
+        return getattr(settings, 'SUGGESTIONS_MAX_AGE', 300)
+
+    def build(self):
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            self._build_changes = {}
+        keys, labels, make_ids = [], {}, {}
+
+        def add(kind, pk, label):
+            labels[(kind, pk)] = label
+            keys.extend((key, KIND_RANK[kind], pk) for key in word_keys(label))
+
+        try:
+            for pk, name in Make.objects.values_list('make_id', 'make_name').iterator():
+                add('make', pk, name)
+            for pk, name, make_id in MakeModel.objects.values_list('model_id', 'model_name', 'make_id').iterator():
+                add('model', pk, name)
+                make_ids[pk] = make_id
+            for pk, name in VehicleDetail.objects.exclude(vehicle_display_name__isnull=True).values_list(
+                    'id', 'vehicle_display_name').iterator(chunk_size=5000):
+                add('vehicle', pk, name)
+            keys.sort()
+        except Exception:
+            with self._lock:
+                self._build_changes = None
+            raise
+
+        with self._lock:
+            self._state = IndexState(keys, labels, make_ids)
+            self._pending, self._build_changes = self._build_changes, None
+            self._built_at = time.monotonic()
+
+    def _rebuild_in_background(self):
+        if not self._build_lock.acquire(blocking=False):
+            return  # already rebuilding
+
+        def rebuild():
+            try:
+                run_task('Rebuilding the suggestion index', self._build)
+            finally:
+                self._build_lock.release()
+
+        threading.Thread(target=rebuild, name='suggestion-index', daemon=True).start()
+
+    def queue(self, kind, pk, label=None, make_id=None, deleted=False):
+        """Record a changed or deleted row; applied on the next lookup."""
+        with self._lock:
+            if self._built_at is None and self._build_changes is None:
+                return
+            value = None if deleted or not label else (label, make_id)
+            self._pending[(kind, pk)] = value
+            if self._build_changes is not None:
+                self._build_changes[(kind, pk)] = value
+
+    def _apply_pending(self):
+        if not self._apply_lock.acquire(blocking=False):
+            return  # another lookup is merging; use the current index meanwhile
+        try:
+            with self._lock:
+                changed, self._pending = self._pending, {}
+                state = self._state
+            if not changed:
+                return
+            new_state = apply_changes(state, changed)
+            with self._lock:
+                if self._state is state:
+                    self._state = new_state
+                else:
+                    # A rebuild replaced the index meanwhile; apply the changes to it instead
+                    self._pending = {**changed, **self._pending}
+        finally:
+            self._apply_lock.release()
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self._build()
+        elif time.monotonic() - self._built_at > self.get_max_age():
+            self._rebuild_in_background()
+
+        if self._pending:
+            self._apply_pending()
+        # Published states are never modified, so no lock is needed to read one
+        keys, labels, make_ids = self._state
+
+        seen = set()
+        matches = []
+        # Scan a few times the limit so makes and models can outrank vehicles
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and len(matches) < limit * 5 and keys[i][0].startswith(prefix):
+            _, rank, pk = keys[i]
+            if (rank, pk) not in seen:
+                seen.add((rank, pk))
+                matches.append((rank, pk))
+            i += 1
+
+        kinds = {rank: kind for kind, rank in KIND_RANK.items()}
+        results = []
+        for rank, pk in matches:
+            kind = kinds[rank]
+            item = {'type': kind, 'id': pk, 'label': labels[(kind, pk)]}
+            if kind == 'model':
+                item['make_id'] = make_ids.get(pk)
+                item['make_name'] = labels.get(('make', item['make_id']))
+            results.append(item)
+        results.sort(key=lambda item: (KIND_RANK[item['type']], len(item['label']), item['label'].lower()))
+        return results[:limit]
+
+
+suggestion_index = SuggestionIndex()
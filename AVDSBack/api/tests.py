@@ -0,0 +1,577 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.utils import timezone
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from . import catalog
+from .analytics import CounterBuffer, merge_view_counts, search_analytics_buffer, view_count_buffer
+from .background import run_task
+from .chat import ChatLimiter, astream_events, event_stream_response, prepare_chat
+from .importer import VehicleImporter, import_lock
+from .jobs import claim_job, run_job
+from .models import Body, DriveType, Favorite, ImportJob, Make, MakeModel, Review, VehicleDetail, VehicleImage
+from .remote_images import RemoteImageFetcher, store_by_hash
+from .retrieval import parse_message
+from .signals import vehicles_imported
+from .stats import refresh_stats
+from .suggestions import SuggestionIndex
+
+# The catalog tables come from the legacy database and are unmanaged, so
+# migrations never create them; the tests create them once per run.
+CATALOG_MODELS = (Make, MakeModel, Body, DriveType, VehicleDetail)
+
+
+def setUpModule():
+    with connection.schema_editor() as editor:
+        for model in CATALOG_MODELS:
+            editor.create_model(model)
+
+
+def tearDownModule():
+    with connection.schema_editor() as editor:
+        for model in reversed(CATALOG_MODELS):
+            editor.delete_model(model)
+
+
+@override_settings(
+    # Keep background threads and downloads out of the tests
+    SEARCH_ANALYTICS_FLUSH_INTERVAL=3600,
+    VIEW_COUNT_FLUSH_INTERVAL=3600,
+    REMOTE_IMAGE_CACHE=False,
+)
+class CatalogTestCase(APITestCase):
+    vehicle_count = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        toyota = Make.objects.create(make_id=1, make_name='Toyota')
+        bmw = Make.objects.create(make_id=2, make_name='BMW')
+        models = [
+            MakeModel.objects.create(model_id=1, make=toyota, model_name='Corolla'),
+            MakeModel.objects.create(model_id=2, make=toyota, model_name='Camry'),
+            MakeModel.objects.create(model_id=3, make=bmw, model_name='X5'),
+        ]
+        sedan = Body.objects.create(body_id=1, body_name='Sedan')
+        fwd = DriveType.objects.create(drive_type_id=1, drive_type_name='FWD')
+        cls.vehicles = []
+        for pk in range(1, cls.vehicle_count + 1):
+            model = models[pk % len(models)]
+            cls.vehicles.append(VehicleDetail.objects.create(
+                id=pk, make_id=model.make_id, model=model, body=sedan, drive_type=fwd,
+                vehicle_display_name=f'{model.make.make_name} {model.model_name} {2000 + pk}',
+                year=2000 + pk, engine='2.0L', engine_cc=2000,
+            ))
+        cls.user = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        for vehicle in cls.vehicles:
+            VehicleImage.objects.create(vehicle=vehicle, image_url=f'http://img.test/{vehicle.pk}.jpg', is_primary=True)
+            VehicleImage.objects.create(vehicle=vehicle, image_url=f'http://img.test/{vehicle.pk}b.jpg')
+            Review.objects.create(user=cls.user, vehicle=vehicle, rating=4, comment='Good')
+            Favorite.objects.create(user=cls.user, vehicle=vehicle)
+
+    def setUp(self):
+        cache.clear()
+        caches['chat'].clear()
+
+    def tearDown(self):
+        # Write buffered counts inside the test's transaction so none are left
+        # for the exit flush, which would run after the test database is gone
+        search_analytics_buffer.flush()
+        view_count_buffer.flush()
+
+
+class QueryBudgetTests(CatalogTestCase):
+    """Each endpoint runs a fixed number of queries, however many rows it returns."""
+
+    def assert_budget(self, budget, url, user=None, **extra):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, HTTP_CACHE_CONTROL='no-cache', **extra)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_vehicle_list(self):
+        # count, page, images, reviews
+        small = self.assert_budget(4, '/api/vehicles/?make_id=2')
+        large = self.assert_budget(4, '/api/vehicles/')
+        self.assertEqual(len(small.data['results']), 4)
+        self.assertEqual(len(large.data['results']), self.vehicle_count)
+
+    def test_vehicle_list_cursor(self):
+        # page, images, reviews; no count
+        self.assert_budget(3, '/api/vehicles/?pagination=cursor&page_size=12')
+
+    def test_vehicle_detail(self):
+        self.assert_budget(3, f'/api/vehicles/{self.vehicles[0].pk}/')
+
+    def test_favorites(self):
+        response = self.assert_budget(4, '/api/favorites/', user=self.user)
+        self.assertEqual(len(response.data), self.vehicle_count)
+
+    def test_admin_dashboard(self):
+        refresh_stats()
+        response = self.assert_budget(1, '/api/admin/stats/', user=self.admin)
+        self.assertEqual(response.data['total_vehicles'], self.vehicle_count)
+
+
+class CardImageTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        VehicleImage.objects.create(
+            vehicle=cls.vehicles[2], image='vehicle_images/big.jpg', is_primary=True,
+            variants={str(width): {'jpeg': f'vehicle_images/variants/x/{width}.jpg'} for width in (320, 640, 1280)},
+        )
+
+    def primary_image(self, url, user=None):
+        self.client.force_authenticate(user)
+        data = self.client.get(url).data
+        vehicles = data['results'] if isinstance(data, dict) and 'results' in data else data
+        if isinstance(vehicles, dict):
+            return vehicles['primary_image']
+        return next(vehicle['primary_image'] for vehicle in vehicles if vehicle['id'] == 3)
+
+    def test_cards_default_to_the_card_width(self):
+        self.assertEqual(self.primary_image('/api/vehicles/?make_id=1'), '/media/vehicle_images/variants/x/320.jpg')
+        self.assertEqual(self.primary_image('/api/favorites/', self.user), '/media/vehicle_images/variants/x/320.jpg')
+
+    def test_image_width_overrides_the_default(self):
+        self.assertEqual(self.primary_image('/api/vehicles/?make_id=1&image_width=1000'),
+                         '/media/vehicle_images/variants/x/1280.jpg')
+        self.assertEqual(self.primary_image('/api/vehicles/?make_id=1&image_width=original'),
+                         '/media/vehicle_images/big.jpg')
+
+    def test_detail_serves_the_original(self):
+        self.assertEqual(self.primary_image('/api/vehicles/3/'), '/media/vehicle_images/big.jpg')
+
+
+class SearchRankTests(CatalogTestCase):
+    def test_relevance_runs_match_once(self):
+        # The bm25 rank comes from one join with the index, not a per-row subquery
+        with self.assertNumQueries(4) as queries:
+            response = self.client.get('/api/vehicles/?q=toyota%202004&sort_by=relevance')
+        page_sql = next(query['sql'] for query in queries.captured_queries if 'ORDER BY' in query['sql'])
+        self.assertEqual(page_sql.count('MATCH'), 1)
+        self.assertEqual(response.data['results'][0]['id'], 4)
+
+    def test_relevance_cursor_pages(self):
+        seen = []
+        url = '/api/vehicles/?q=toyota&sort_by=relevance&pagination=cursor&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(vehicle['id'] for vehicle in response.data['results'])
+            url = response.data['next']
+        toyotas = [vehicle.pk for vehicle in self.vehicles if vehicle.make_id == 1]
+        self.assertEqual(sorted(seen), toyotas)
+
+
+class KeysetPaginationTests(CatalogTestCase):
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(vehicle['id'] for vehicle in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_pages_match_offset_order(self):
+        for sort_by in ('views', 'year_desc', 'price_asc', 'price_desc'):
+            with self.subTest(sort_by=sort_by):
+                expected = [v['id'] for v in self.client.get(f'/api/vehicles/?sort_by={sort_by}').data['results']]
+                ids, pages = self.walk(f'/api/vehicles/?sort_by={sort_by}&pagination=cursor&page_size=5')
+                self.assertEqual(ids, expected)
+                self.assertEqual(pages, 3)
+
+    def test_ties_resume_on_id(self):
+        # Every vehicle has zero views, so only the id tie-breaker orders them
+        ids, _ = self.walk('/api/vehicles/?sort_by=views&pagination=cursor&page_size=1')
+        self.assertEqual(ids, sorted(vehicle.pk for vehicle in self.vehicles))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/vehicles/?cursor=not-a-cursor').status_code, 404)
+        cursor = self.client.get('/api/vehicles/?sort_by=views&pagination=cursor&page_size=2').data['next']
+        other_sort = cursor.replace('sort_by=views', 'sort_by=year_desc')
+        self.assertEqual(self.client.get(other_sort).status_code, 404)
+
+    def test_cursor_values_of_the_wrong_type(self):
+        for sort_by, values in (('default', ['abc']), ('default', [[1]]), ('year_desc', [{'y': 1}, 3]),
+                                ('year_desc', ['soon', 3]), ('views', [True, 3])):
+            with self.subTest(values=values):
+                payload = json.dumps({'s': sort_by, 'v': values}).encode('utf-8')
+                cursor = base64.urlsafe_b64encode(payload).decode('ascii')
+                response = self.client.get(f'/api/vehicles/?sort_by={sort_by}&cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+
+
+class ViewCountTests(CatalogTestCase):
+    def test_revisit_answered_with_304_counts(self):
+        url = f'/api/vehicles/{self.vehicles[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(view_count_buffer._counts[self.vehicles[0].pk], 2)
+
+    def test_missing_vehicle_is_not_counted(self):
+        self.assertEqual(self.client.get('/api/vehicles/999/').status_code, 404)
+        self.assertNotIn(999, view_count_buffer._counts)
+
+    def test_merge_invalidates_views_sort(self):
+        url = '/api/vehicles/?sort_by=views'
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            merge_view_counts({5: 3})
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['id'], 5)
+
+    def test_merge_keeps_other_sorts_cached(self):
+        url = '/api/vehicles/?sort_by=year_desc'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            merge_view_counts({5: 3})
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+
+class SuggestionIndexTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = SuggestionIndex()
+        self.index.build()
+
+    def labels(self, prefix):
+        return [item['label'] for item in self.index.suggest(prefix)]
+
+    def test_changes_are_bisected_into_place(self):
+        self.index.queue('vehicle', 1, 'Lada Niva 1977')
+        self.index.queue('vehicle', 2, deleted=True)
+        self.assertEqual(self.labels('niva'), ['Lada Niva 1977'])
+        self.assertNotIn('Toyota Camry 2001', self.labels('toyota camry'))
+        self.assertEqual(self.labels('x5 2002'), [])
+        self.assertEqual(self.index._state.keys, sorted(self.index._state.keys))
+
+    def test_large_batches_are_merged_into_a_new_state(self):
+        before = self.index._state
+        for pk in range(100, 400):
+            self.index.queue('vehicle', pk, f'Lada Niva {pk}')
+        self.index.queue('vehicle', 1, 'Lada Samara 1990')
+        self.assertEqual(len(self.index.suggest('lada niva', limit=20)), 20)
+        self.assertEqual(self.labels('samara'), ['Lada Samara 1990'])
+        state = self.index._state
+        self.assertEqual(state.keys, sorted(set(state.keys)))
+        self.assertEqual(len(state.keys), len(before.keys) + 300 * 3)
+        # A lookup still holding the old state sees it unchanged
+        self.assertEqual(before.labels[('vehicle', 1)], 'Toyota Camry 2001')
+
+    def test_changes_queued_during_build_are_kept(self):
+        def values_list(*fields):
+            # A save lands after the build has started reading rows
+            self.index.queue('vehicle', 1, 'Lada Niva 1977')
+            return Make.objects.all().values_list(*fields)
+
+        with mock.patch.object(Make.objects, 'values_list', values_list):
+            self.index.build()
+        self.assertEqual(self.labels('niva'), ['Lada Niva 1977'])
+
+    def test_stale_index_is_served_during_rebuild(self):
+        self.index._built_at -= 3600
+        with self.index._build_lock:
+            # Another rebuild is running; the lookup neither waits nor starts one
+            self.assertIn('Toyota Camry 2001', self.labels('camry 2001'))
+
+
+class CatalogSnapshotTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(CATALOG_SNAPSHOT_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(setattr, catalog, '_current', None)
+        catalog.build_snapshot()
+
+    def restart(self):
+        # A new process: no snapshot in memory and no cached table versions
+        catalog._current = None
+        cache.clear()
+
+    def test_snapshot_reused_after_restart(self):
+        version = catalog.get_snapshot().version
+        self.restart()
+        with mock.patch.object(catalog, 'render_catalog') as render, self.assertNumQueries(1):
+            self.assertEqual(catalog.get_snapshot().version, version)
+        render.assert_not_called()
+
+    def test_stale_snapshot_rebuilt_after_restart(self):
+        # Renamed while this process was down, e.g. by another worker
+        Make.objects.filter(pk=2).update(make_name='Bayerische Motoren Werke')
+        self.restart()
+        self.assertIn(b'Bayerische Motoren Werke', catalog.get_snapshot().body)
+
+    def test_no_temporary_files_left(self):
+        catalog.build_snapshot()
+        self.assertEqual(sorted(os.listdir(catalog.snapshot_dir())),
+                         ['catalog.json', 'catalog.json.gz', 'catalog.meta.json'])
+
+
+class ImporterTests(CatalogTestCase):
+    def rows(self, *names):
+        return [{'make': make, 'model': model, 'year': '2020', 'price': '1', 'engine': '1.6L'} for make, model in names]
+
+    def test_signal_sent_after_commit(self):
+        received = []
+        handler = lambda sender, vehicle_ids, **kwargs: received.append(vehicle_ids)
+        vehicles_imported.connect(handler)
+        self.addCleanup(vehicles_imported.disconnect, handler)
+        with self.captureOnCommitCallbacks() as callbacks:
+            VehicleImporter(chunk_size=1).import_rows(self.rows(('Lada', 'Niva'), ('Lada', '2107')))
+            self.assertEqual(received, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(received, [[13], [14]])
+
+    def test_importers_resolve_ids_from_the_database(self):
+        # Both created before either has written anything
+        first, second = VehicleImporter(), VehicleImporter()
+        first.import_rows(self.rows(('Lada', 'Niva')))
+        result = second.import_rows(self.rows(('Lada', 'Niva'), ('Skoda', 'Octavia')))
+        self.assertEqual(result.error_count, 0)
+        self.assertEqual(result.makes_created, 1)
+        self.assertEqual(VehicleDetail.objects.count(), self.vehicle_count + 3)
+        self.assertEqual(Make.objects.filter(make_name='Lada').count(), 1)
+
+    def test_imports_interleave_between_chunks(self):
+        def job_rows():
+            yield from self.rows(('Lada', 'Niva'))
+            # An upload arrives while the job is between chunks
+            self.assertFalse(import_lock.locked())
+            upload = VehicleImporter().import_rows(self.rows(('Skoda', 'Octavia')))
+            self.assertEqual(upload.imported, 1)
+            yield from self.rows(('Lada', '2107'))
+
+        result = VehicleImporter(chunk_size=1).import_rows(job_rows())
+        self.assertEqual((result.imported, result.error_count), (2, 0))
+        self.assertEqual(sorted(VehicleDetail.objects.filter(pk__gt=self.vehicle_count).values_list('pk', flat=True)), [13, 14, 15])
+
+
+class ChatGroundingTests(CatalogTestCase):
+    def test_sentence_punctuation_is_ignored(self):
+        self.assertEqual(parse_message('I want a Camry.').model_ids, [2])
+        self.assertEqual(parse_message('Is there a Toyota.').make_ids, [1])
+        self.assertEqual(parse_message('Any sedan, maybe a BMW?').body_ids, [1])
+
+    def test_cache_key_depends_on_grounding(self):
+        def cache_key(**data):
+            return prepare_chat({'message': 'I want a Camry.', **data}, {}, None, {}, 'test-model').cache_key
+
+        self.assertNotEqual(cache_key(), cache_key(catalog=False))
+        with override_settings(CHAT_CATALOG_CONTEXT=False):
+            self.assertEqual(cache_key(), cache_key(catalog=False))
+
+
+class ImportJobClaimTests(CatalogTestCase):
+    def job(self, status, age=0):
+        job = ImportJob.objects.create(file='imports/test.csv', original_name='test.csv', status=status)
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=age))
+        return job
+
+    def test_job_is_claimed_once(self):
+        job = self.job(ImportJob.STATUS_PENDING)
+        self.assertTrue(claim_job(job.pk))
+        self.assertFalse(claim_job(job.pk))
+
+    def test_stale_running_job_can_be_claimed(self):
+        self.assertTrue(claim_job(self.job(ImportJob.STATUS_RUNNING, age=3600).pk))
+        self.assertFalse(claim_job(self.job(ImportJob.STATUS_COMPLETED, age=3600).pk))
+
+    def test_job_running_elsewhere_is_not_run_again(self):
+        job = self.job(ImportJob.STATUS_RUNNING)
+        self.assertIsNone(run_job(job.pk))
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(f'/api/admin/import-jobs/{job.pk}/resume/')
+        self.assertEqual(response.status_code, 409)
+
+
+def png_bytes(color):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageHostHandler(BaseHTTPRequestHandler):
+    """Stand-in for a third-party image host."""
+    files = {}
+    hits = {}
+
+    def do_GET(self):
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        body = self.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RemoteImageTests(CatalogTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        red = png_bytes('red')
+        ImageHostHandler.files = {'/red.png': red, '/red-copy.png': red, '/blue.png': png_bytes('blue'), '/text.png': b'hello'}
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHostHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        ImageHostHandler.hits = {}
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+
+    def fetch(self, paths, **options):
+        images = [
+            VehicleImage.objects.create(vehicle=self.vehicles[i], image_url=self.base_url + path)
+            for i, path in enumerate(paths)
+        ]
+        fetcher = RemoteImageFetcher(workers=2, timeout=(1, 2), retries=0, **options)
+        stats = fetcher.cache_images(VehicleImage.objects.filter(pk__in=[image.pk for image in images]))
+        return stats, [VehicleImage.objects.get(pk=image.pk) for image in images]
+
+    def test_identical_images_are_fetched_and_stored_once(self):
+        stats, images = self.fetch(['/red.png', '/red.png', '/red-copy.png', '/blue.png'])
+        self.assertEqual((stats['downloaded'], stats['cached'], stats['failed']), (3, 4, 0))
+        self.assertEqual(ImageHostHandler.hits['/red.png'], 1)
+        # Two URLs, one red file
+        self.assertEqual(len({image.image.name for image in images}), 2)
+        self.assertEqual(images[0].image.name, images[2].image.name)
+        self.assertNotEqual(images[0].content_hash, images[3].content_hash)
+        stored = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(len(stored), 2)
+
+    def test_concurrent_stores_of_the_same_content_keep_one_file(self):
+        content = png_bytes('green')
+        content_hash = hashlib.sha256(content).hexdigest()
+        barrier = threading.Barrier(8)
+        paths = []
+
+        def store():
+            barrier.wait()
+            paths.append(store_by_hash(content, content_hash, 'png'))
+
+        threads = [threading.Thread(target=store) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(paths)), 1)
+        stored = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(stored, [f'{content_hash}.png'])
+
+    def test_oversized_and_missing_images_fail(self):
+        stats, images = self.fetch(['/red.png', '/missing.png'], max_bytes=50)
+        self.assertEqual((stats['downloaded'], stats['failed']), (0, 2))
+        self.assertTrue(any('larger than 50 bytes' in error for error in stats['errors']))
+        self.assertTrue(all(not image.image for image in images))
+
+    def test_non_image_content_fails(self):
+        stats, images = self.fetch(['/text.png'])
+        self.assertEqual(stats['failed'], 1)
+        self.assertIn('is not an image', stats['errors'][0])
+        self.assertFalse(images[0].image)
+
+
+class BackgroundTaskTests(SimpleTestCase):
+    def test_counter_buffer_requires_write(self):
+        with self.assertRaises(TypeError):
+            CounterBuffer()
+
+    def test_failed_flush_is_logged_and_kept(self):
+        class FailingBuffer(CounterBuffer):
+            name = 'failing'
+            def write(self, counts, last_seen):
+                raise RuntimeError('database is locked')
+
+        buffer = FailingBuffer(flush_interval=3600, flush_size=1000)
+        buffer.add('corolla')
+        with self.assertLogs('api.background', level='ERROR') as logs:
+            run_task('Flushing failing counts', buffer.flush)
+        self.assertIn('Flushing failing counts failed', logs.output[0])
+        self.assertEqual(buffer._counts['corolla'], 1)
+
+
+class ChatLimiterTests(SimpleTestCase):
+    async def test_slot_freed_when_stream_never_starts(self):
+        limiter = ChatLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.1)
+        release = await limiter.acquire()
+
+        async def tokens():
+            yield 'never reached'
+
+        events = astream_events(SimpleNamespace(cached=None), tokens, on_close=release)
+        # The client went away before the first event was sent
+        event_stream_response(events, on_close=release).close()
+        second = await limiter.acquire()
+        second()
+
+    async def test_slot_freed_on_the_loop_when_closed_from_another_thread(self):
+        limiter = ChatLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.1)
+        release = await limiter.acquire()
+        semaphore = limiter._state()['semaphore']
+        released_on = []
+        original_release = semaphore.release
+
+        def record_release():
+            released_on.append(threading.get_ident())
+            original_release()
+
+        semaphore.release = record_release
+
+        async def tokens():
+            yield 'never reached'
+
+        response = event_stream_response(astream_events(SimpleNamespace(cached=None), tokens), on_close=release)
+        # Django's ASGI handler calls close() through sync_to_async, i.e. on a worker thread
+        await asyncio.to_thread(response.close)
+        second = await limiter.acquire()
+        second()
+        self.assertEqual(released_on[0], threading.get_ident())
@@ -7,17 +7,24 @@ from .views import (
     RegisterView, UserDetailView, FavoriteView, ReviewView, ReviewDetailView,
     VehicleUpdateView, VehicleImageView, VehicleImageDetailView,
     AdminStatsView, VehicleUploadView, VehicleUploadTemplateView, HomepageFeatureView,
-    VehicleRetrieveView, CustomTokenObtainPairView, PasswordResetRequestView, PasswordResetConfirmView
+    VehicleRetrieveView, VehicleFacetsView, SuggestionView, CatalogSnapshotView,
+    ImportJobListView, ImportJobDetailView, ImportJobResumeView, VehicleExportView, ChatSessionView, AsyncChatView,
+    CustomTokenObtainPairView, PasswordResetRequestView, PasswordResetConfirmView
 )
 
 urlpatterns = [
+    path('catalog/', CatalogSnapshotView.as_view(), name='catalog-snapshot'),
     path('makes/', MakeList.as_view(), name='make-list'),
     path('models/', MakeModelList.as_view(), name='model-list'),
     path('bodies/', BodyList.as_view(), name='body-list'),
     path('drivetypes/', DriveTypeList.as_view(), name='drivetype-list'),
     path('vehicles/', VehicleDetailList.as_view(), name='vehicle-list'),
+    path('vehicles/facets/', VehicleFacetsView.as_view(), name='vehicle-facets'),
     path('vehicles/<int:pk>/', VehicleRetrieveView.as_view(), name='vehicle-detail'),
+    path('suggestions/', SuggestionView.as_view(), name='suggestions'),
     path('chat/', ChatView.as_view(), name='chat'),
+    path('chat/async/', AsyncChatView.as_view(), name='chat-async'),
+    path('chat/sessions/<uuid:pk>/', ChatSessionView.as_view(), name='chat-session'),
     
     # Auth endpoints
     path('register/', RegisterView.as_view(), name='register'),
@@ -36,6 +43,10 @@ urlpatterns = [
     # Admin endpoints
     path('admin/stats/', AdminStatsView.as_view(), name='admin-stats'),
     path('admin/upload-vehicles/', VehicleUploadView.as_view(), name='admin-upload-vehicles'),
+    path('admin/import-jobs/', ImportJobListView.as_view(), name='admin-import-jobs'),
+    path('admin/import-jobs/<int:pk>/', ImportJobDetailView.as_view(), name='admin-import-job'),
+    path('admin/import-jobs/<int:pk>/resume/', ImportJobResumeView.as_view(), name='admin-import-job-resume'),
+    path('admin/export-vehicles/', VehicleExportView.as_view(), name='admin-export-vehicles'),
     path('admin/upload-template/', VehicleUploadTemplateView.as_view(), name='admin-upload-template'),
     path('admin/features/', HomepageFeatureView.as_view(), name='admin-features'),
 ]
@@ -3,27 +3,51 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import requests
-import os
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.views import TokenObtainPairView
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.views import View
 from .models import Make, MakeModel, Body, DriveType, VehicleDetail, Favorite, Review
 from .serializers import (
     MakeSerializer, MakeModelSerializer, BodySerializer,
     DriveTypeSerializer, VehicleDetailSerializer,
     RegisterSerializer, UserSerializer, FavoriteSerializer, ReviewSerializer,
-    SearchAnalyticsSerializer, HomepageFeatureSerializer,
-    CustomTokenObtainPairSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer
+    HomepageFeatureSerializer, ImportJobSerializer, ChatSessionSerializer,
+    CustomTokenObtainPairSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
+    parse_field_list
 )
-from .models import SearchAnalytics, HomepageFeature
+from .models import HomepageFeature, ImportJob, ChatSession
+from .filters import filter_vehicles, normalize_filters
+from .caching import chat_response_cache, vehicle_list_cache, vehicle_version, view_counts_version
+from .conditional import ConditionalGetMixin
+from .analytics import search_analytics_buffer, view_count_buffer
+from .facets import get_facets
+from .suggestions import suggestion_index
+from .catalog import build_snapshot, get_snapshot
+from .importer import ImportFormatError, VehicleImporter, read_csv_rows
+from .jobs import is_active, is_running_elsewhere, submit_job
+from .export import export_queryset, stream_csv, stream_ndjson
+from .stats import dashboard_stats
+from .images import card_image_width, image_size
+from .llm import LLMError, async_ollama_client, ollama_client
+from .chat import (
+    ChatRequestError, astream_events, chat_limiter, complete_chat, event_stream_response, prepare_chat,
+    stream_events,
+)
+from .pagination import VehicleKeysetPagination, ordering_for
 import csv
 import io
-from django.http import HttpResponse
-from datetime import timedelta
+import json
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import parse_etags
 from django.utils import timezone
 from django.db.models import Count, Sum
 
@@ -70,11 +94,13 @@ class PasswordResetConfirmView(APIView):
                 return Response({'error': 'Invalid token or user.'}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class MakeList(generics.ListAPIView):
+class MakeList(ConditionalGetMixin, generics.ListAPIView):
+    etag_models = (Make,)
     queryset = Make.objects.all()
     serializer_class = MakeSerializer
 
-class MakeModelList(generics.ListAPIView):
+class MakeModelList(ConditionalGetMixin, generics.ListAPIView):
+    etag_models = (MakeModel,)
     serializer_class = MakeModelSerializer
 
     def get_queryset(self):
@@ -84,190 +110,296 @@ class MakeModelList(generics.ListAPIView):
             queryset = queryset.filter(make_id=make_id)
         return queryset
 
-class BodyList(generics.ListAPIView):
+class BodyList(ConditionalGetMixin, generics.ListAPIView):
+    etag_models = (Body,)
     queryset = Body.objects.all()
     serializer_class = BodySerializer
 
-class DriveTypeList(generics.ListAPIView):
+class DriveTypeList(ConditionalGetMixin, generics.ListAPIView):
+    etag_models = (DriveType,)
     queryset = DriveType.objects.all()
     serializer_class = DriveTypeSerializer
 
 class VehicleDetailList(generics.ListAPIView):
     serializer_class = VehicleDetailSerializer
 
-    def get_queryset(self):
-        queryset = VehicleDetail.objects.all()
-        
-        # Exact matches
-        make_id = self.request.query_params.get('make_id')
-        model_id = self.request.query_params.get('model_id')
-        year = self.request.query_params.get('year')
-        
-        # Name matches
-        make_name = self.request.query_params.get('make_name')
-        engine = self.request.query_params.get('engine')
+    # sort_by -> (field, descending) keys. Each ends on the unique id so pages
+    # are stable and cursor pagination can resume after any row.
+    sort_orderings = {
+        'relevance': (('search_rank', False), ('id', False)),
+        'views': (('metadata__views_count', True), ('id', False)),
+        'year_desc': (('year', True), ('id', False)),
+        'price_asc': (('metadata__price', False), ('id', False)),
+        'price_desc': (('metadata__price', True), ('id', False)),
+    }
+    default_ordering = (('id', False),)
+
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or a cursor from a previous page) opts into keyset pagination
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or params.get('cursor'):
+                self._paginator = VehicleKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
-        # Ranges
-        min_year = self.request.query_params.get('min_year')
-        max_year = self.request.query_params.get('max_year')
-        
-        # Text search
-        q = self.request.query_params.get('q')
-        
-        # Price filtering (Annotate first)
-        from django.db.models import F, Case, When, Value, IntegerField
-        
-        # Formula: 20000 + (year - 1990) * 500 + (engine_cc || 2000) * 5
-        # Handle nulls for year and engine_cc
-        queryset = queryset.annotate(
-            year_val=Case(
-                When(year__isnull=False, then=F('year')),
-                default=Value(2000),
-                output_field=IntegerField()
-            ),
-            engine_cc_val=Case(
-                When(engine_cc__isnull=False, then=F('engine_cc')),
-                default=Value(2000),
-                output_field=IntegerField()
-            )
-        ).annotate(
-            price=Value(20000) + (F('year_val') - 1990) * 500 + F('engine_cc_val') * 5
-        )
+    def get_sort_name(self):
+        sort_by = self.request.query_params.get('sort_by')
+        if sort_by == 'relevance' and not self.request.query_params.get('q'):
+            return 'default'
+        return sort_by if sort_by in self.sort_orderings else 'default'
+
+    def get_sort_keys(self):
+        return self.sort_orderings.get(self.get_sort_name(), self.default_ordering)
+
+    def get_cache_key(self):
+        params = self.request.query_params
+        pagination = 'cursor' if isinstance(self.paginator, VehicleKeysetPagination) else 'page'
+        sort_name = self.get_sort_name()
+        return vehicle_list_cache.key_for([
+            self.request.get_host(),
+            normalize_filters(params),
+            sort_name,
+            # View counts change without touching the catalog version
+            view_counts_version() if sort_name == 'views' else None,
+            pagination,
+            params.get('page', '1').strip() or '1',
+            params.get('page_size', '').strip(),
+            params.get('cursor', ''),
+            sorted(parse_field_list(params.get('fields')) or []) if 'fields' in params else None,
+            sorted(parse_field_list(params.get('embed')) or []) if 'embed' in params else None,
+            image_size(self.request, card_image_width()),
+        ])
+
+    def get_serializer_context(self):
+        # Results render as cards, so they link a card-sized copy by default
+        return {**super().get_serializer_context(), 'default_image_width': card_image_width()}
+
+    def record_search(self, q):
+        # Log search query; buffered in memory and flushed in batches (see api/analytics.py)
+        # Simple debounce/spam check could be added here, but for now just log
+        if len(q.strip()) > 2:
+            search_analytics_buffer.record(q)
+
+    def list(self, request, *args, **kwargs):
+        q = request.query_params.get('q')
+        if q:
+            self.record_search(q)
+
+        # Identical queries are served from the response cache (see api/caching.py)
+        cache_key = self.get_cache_key()
+        data = vehicle_list_cache.get(cache_key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+
+        vehicle_list_cache.set(cache_key, response.data, [vehicle.pk for vehicle in page])
+        response['X-Cache'] = 'MISS'
+        return response
 
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
+    def get_queryset(self):
+        queryset = VehicleDetailSerializer.setup_eager_loading(
+            VehicleDetail.objects.all(), self.request.query_params
+        )
+        queryset = filter_vehicles(
+            queryset, self.request.query_params, rank=self.get_sort_name() == 'relevance'
+        )
 
-        if make_id:
-            queryset = queryset.filter(make_id=make_id)
-        if make_name:
-            queryset = queryset.filter(make__make_name__iexact=make_name)
-        if model_id:
-            queryset = queryset.filter(model_id=model_id)
-        if year:
-            queryset = queryset.filter(year=year)
-        if engine:
-            queryset = queryset.filter(engine__icontains=engine)
-            
-        if min_year:
-            queryset = queryset.filter(year__gte=min_year)
-        if max_year:
-            queryset = queryset.filter(year__lte=max_year)
-            
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-            
-        if q:
-            # Log search query
-            # Simple debounce/spam check could be added here, but for now just log
-            if len(q.strip()) > 2:
-                analytics, created = SearchAnalytics.objects.get_or_create(query=q.lower())
-                if not created:
-                    analytics.count = F('count') + 1
-                    analytics.save()
-
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(vehicle_display_name__icontains=q) |
-                Q(make__make_name__icontains=q) |
-                Q(model__model_name__icontains=q)
-            )
-        
         # Sorting
-        sort_by = self.request.query_params.get('sort_by')
-        if sort_by == 'views':
-            queryset = queryset.order_by('-metadata__views_count')
-        elif sort_by == 'year_desc':
-            queryset = queryset.order_by('-year')
-        elif sort_by == 'price_asc':
-            queryset = queryset.order_by('price')
-        elif sort_by == 'price_desc':
-            queryset = queryset.order_by('-price')
-            
-        return queryset
+        return queryset.order_by(*ordering_for(self.get_sort_keys()))
 
-class ChatView(APIView):
-    def post(self, request):
-        user_message = request.data.get('message')
-        context = request.data.get('context', {})
-        history = request.data.get('history', [])
-        
-        if not user_message:
-            return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
+class VehicleFacetsView(APIView):
+    def get(self, request):
+        return Response(get_facets(request.query_params))
 
-        # Read system prompt
+class SuggestionView(APIView):
+    def get(self, request):
         try:
-            with open(os.path.join(settings.BASE_DIR, 'ai_system_prompt.txt'), 'r') as f:
-                system_prompt_text = f.read()
-        except FileNotFoundError:
-            system_prompt_text = "You are a helpful assistant."
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        return Response(suggestion_index.suggest(request.query_params.get('q', ''), limit))
 
-        # Construct messages list for Ollama /api/chat
-        messages = [{'role': 'system', 'content': system_prompt_text}]
-        
-        # Add history
-        for msg in history:
-            messages.append({
-                'role': msg.get('role', 'user'),
-                'content': msg.get('content', '')
-            })
-            
-        # Add current message with context
-        context_str = f"\nContext: {context}" if context else ""
-        messages.append({
-            'role': 'user',
-            'content': f"{user_message}{context_str}"
-        })
+class CatalogSnapshotView(APIView):
+    def get(self, request):
+        snapshot = get_snapshot()
+        etag = f'"{snapshot.version}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = HttpResponse(snapshot.gzipped, content_type='application/json; charset=utf-8')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(snapshot.body, content_type='application/json; charset=utf-8')
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, no-cache'
+        return response
 
-        # Call Ollama Chat API
+class ChatView(APIView):
+    def post(self, request):
+        # Session, catalog grounding, prompt and cache lookup (see api/chat.py)
         try:
-            ollama_response = requests.post('http://localhost:11434/api/chat', json={
-                'model': 'gpt-oss:20b-cloud',
-                'messages': messages,
-                'stream': False
-            })
-            
-            if ollama_response.status_code == 200:
-                response_data = ollama_response.json()
-                # Ollama /api/chat returns 'message': {'role': 'assistant', 'content': '...'}
-                ai_content = response_data.get('message', {}).get('content', '')
-                return Response({'response': ai_content})
+            chat = prepare_chat(request.data, request.query_params, request.user, request.META, ollama_client.model)
+        except ChatRequestError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+
+        # Relay tokens as server-sent events when the client asks for a stream
+        if chat.stream:
+            response = event_stream_response(stream_events(chat, lambda: ollama_client.stream_chat(chat.messages)))
+        else:
+            if chat.cached is not None:
+                data = complete_chat(chat, chat.cached, from_cache=True)
             else:
-                # Fallback to generate if chat fails (older ollama or model issues)
-                return self.fallback_generate(system_prompt_text, history, user_message, context)
-                
-        except requests.exceptions.RequestException as e:
-            return Response({'error': f'AI Service Unavailable: {str(e)}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-
-    def fallback_generate(self, system_prompt, history, user_message, context):
-        # Construct full prompt from history
-        full_prompt = f"{system_prompt}\n\n"
-        for msg in history:
-            role = "User" if msg.get('role') == 'user' else "Assistant"
-            full_prompt += f"{role}: {msg.get('content')}\n"
-        
-        full_prompt += f"Context: {context}\nUser: {user_message}\nAssistant:"
-        
+                # Call Ollama Chat API over the pooled session (see api/llm.py)
+                try:
+                    ai_content = ollama_client.chat(chat.messages)
+                except LLMError as e:
+                    if e.status_code != 404:
+                        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                    # Fallback to generate if /api/chat is missing (older ollama)
+                    try:
+                        ai_content = ollama_client.generate(chat.generate_prompt())
+                    except LLMError:
+                        return Response({'error': 'Failed to communicate with AI'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                data = complete_chat(chat, ai_content)
+            response = Response(data)
+
+        for header, value in chat.headers().items():
+            response[header] = value
+        return response
+
+class AsyncChatView(View):
+    """ChatView for ASGI deployments.
+
+    Same request and response format as ChatView, but the LLM call is awaited
+    on the non-blocking client, so a worker serves many chats at once. LLM
+    calls are admitted through ``chat_limiter`` (see api/chat.py); overload
+    answers 429 or 503 with ``Retry-After`` instead of piling up requests.
+    """
+    authentication = JWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # csrf_exempt() wraps the view in a sync function on Django 4.2, which hides the coroutine
+        view.csrf_exempt = True
+        return view
+
+    async def post(self, request):
         try:
-            ollama_response = requests.post('http://localhost:11434/api/generate', json={
-                'model': 'gpt-oss:20b-cloud',
-                'prompt': full_prompt,
-                'stream': False
-            })
-            if ollama_response.status_code == 200:
-                return Response({'response': ollama_response.json().get('response', '')})
-        except:
-            pass
-        return Response({'error': 'Failed to communicate with AI'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            user = await self.authenticate(request)
+        except AuthenticationFailed as e:
+            # Same body and header as DRF's 401 on ChatView
+            response = JsonResponse(
+                e.detail if isinstance(e.detail, dict) else {'detail': e.detail}, status=status.HTTP_401_UNAUTHORIZED
+            )
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+            return response
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            chat = await sync_to_async(prepare_chat)(
+                data, request.GET, user, request.META, async_ollama_client.model
+            )
+            # Cached replies need no LLM call and skip the limiter
+            release = None if chat.cached is not None else await chat_limiter.acquire()
+        except ChatRequestError as e:
+            response = JsonResponse({'error': str(e)}, status=e.status_code)
+            if e.retry_after:
+                response['Retry-After'] = str(e.retry_after)
+            return response
+
+        if chat.stream:
+            # The slot is held until the stream finishes or the response is
+            # closed, whichever comes first; release() is idempotent
+            response = event_stream_response(astream_events(
+                chat, lambda: async_ollama_client.stream_chat(chat.messages), on_close=release
+            ), on_close=release)
+        else:
+            try:
+                if chat.cached is not None:
+                    data = await sync_to_async(complete_chat)(chat, chat.cached, from_cache=True)
+                else:
+                    try:
+                        ai_content = await async_ollama_client.chat(chat.messages)
+                    except LLMError as e:
+                        if e.status_code != 404:
+                            return JsonResponse({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                        # Fallback to generate if /api/chat is missing (older ollama)
+                        try:
+                            ai_content = await async_ollama_client.generate(chat.generate_prompt())
+                        except LLMError:
+                            return JsonResponse(
+                                {'error': 'Failed to communicate with AI'}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+                            )
+                    data = await sync_to_async(complete_chat)(chat, ai_content)
+            finally:
+                if release:
+                    release()
+            response = JsonResponse(data)
+
+        for header, value in chat.headers().items():
+            response[header] = value
+        return response
+
+    async def authenticate(self, request):
+        # Anonymous chat is allowed; a bad token is not
+        result = await sync_to_async(self.authentication.authenticate)(request)
+        return result[0] if result else AnonymousUser()
+
+class ChatSessionView(APIView):
+    def get_object(self, request, pk):
+        try:
+            session = ChatSession.objects.get(pk=pk)
+        except ChatSession.DoesNotExist:
+            return None
+        user = request.user if request.user.is_authenticated else None
+        if session.user_id and (user is None or session.user_id != user.pk):
+            return None
+        return session
+
+    def get(self, request, pk):
+        session = self.get_object(request, pk)
+        if session is None:
+            return Response({'error': 'Chat session not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ChatSessionSerializer(session).data)
+
+    def delete(self, request, pk):
+        session = self.get_object(request, pk)
+        if session is None:
+            return Response({'error': 'Chat session not found'}, status=status.HTTP_404_NOT_FOUND)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 class FavoriteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        favorites = Favorite.objects.filter(user=request.user)
+        from django.db.models import Prefetch
+
+        vehicles_queryset = VehicleDetailSerializer.setup_eager_loading(
+            VehicleDetail.objects.all(), request.query_params
+        )
+        favorites = Favorite.objects.filter(user=request.user).prefetch_related(
+            Prefetch('vehicle', queryset=vehicles_queryset)
+        )
         vehicles = [f.vehicle for f in favorites]
-        return Response(VehicleDetailSerializer(vehicles, many=True).data)
+        context = {'request': request, 'default_image_width': card_image_width()}
+        return Response(VehicleDetailSerializer(vehicles, many=True, context=context).data)
 
     def post(self, request):
         vehicle_id = request.data.get('vehicle_id')
@@ -415,26 +547,13 @@ class AdminStatsView(APIView):
         if not request.user.is_staff:
             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
 
-        # General Stats
-        total_vehicles = VehicleDetail.objects.count()
-        total_users = User.objects.count()
-        total_reviews = Review.objects.count()
-        
-        # Search Analytics
-        daily_searches = SearchAnalytics.objects.filter(
-            last_searched__gte=timezone.now() - timedelta(days=1)
-        ).order_by('-count')[:5]
-        
-        monthly_searches = SearchAnalytics.objects.filter(
-            last_searched__gte=timezone.now() - timedelta(days=30)
-        ).order_by('-count')[:10]
-
+        # Precomputed counts and top searches (see api/stats.py)
         return Response({
-            'total_vehicles': total_vehicles,
-            'total_users': total_users,
-            'total_reviews': total_reviews,
-            'daily_searches': SearchAnalyticsSerializer(daily_searches, many=True).data,
-            'monthly_searches': SearchAnalyticsSerializer(monthly_searches, many=True).data
+            **dashboard_stats(),
+            'cache': {
+                'vehicle_list': vehicle_list_cache.stats(),
+                'chat': chat_response_cache.stats(),
+            }
         })
 
 class VehicleUploadView(APIView):
@@ -452,61 +571,112 @@ class VehicleUploadView(APIView):
              return Response({'error': 'Only CSV files are supported currently'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            decoded_file = file.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-            
-            # Check required columns
-            required_columns = ['make', 'model', 'year', 'price', 'engine']
-            if not all(col in reader.fieldnames for col in required_columns):
-                 return Response({'error': f'Missing required columns: {required_columns}'}, status=status.HTTP_400_BAD_REQUEST)
+            rows = read_csv_rows(file)
+        except ImportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Large files (or an explicit ?background=1) become background jobs
+        background = request.query_params.get('background') or request.data.get('background')
+        threshold = getattr(settings, 'VEHICLE_IMPORT_BACKGROUND_THRESHOLD', 2 * 1024 * 1024)
+        if background in ('1', 'true') or file.size >= threshold:
+            file.seek(0)
+            job = ImportJob.objects.create(created_by=request.user, file=file, original_name=file.name)
+            submit_job(job)
+            data = ImportJobSerializer(job).data
+            data['status_url'] = request.build_absolute_uri(reverse('admin-import-job', args=[job.pk]))
+            return Response(data, status=status.HTTP_202_ACCEPTED)
 
-            success_count = 0
-            errors = []
+        try:
+            result = VehicleImporter().import_rows(rows)
 
-            for index, row in enumerate(reader):
-                try:
-                    # Find or create Make
-                    make, _ = Make.objects.get_or_create(
-                        make_name=row['make'],
-                        defaults={'make_id': Make.objects.count() + 1000 + index}
-                    )
-                    
-                    # Find or create Model
-                    model, _ = MakeModel.objects.get_or_create(
-                        model_name=row['model'],
-                        make=make,
-                        defaults={'model_id': MakeModel.objects.count() + 1000 + index}
-                    )
-
-                    # Create Vehicle
-                    new_id = VehicleDetail.objects.order_by('-id').first().id + 1 if VehicleDetail.objects.exists() else 1
-                    
-                    vehicle = VehicleDetail.objects.create(
-                        id=new_id,
-                        make=make,
-                        model=model,
-                        year=row.get('year'),
-                        engine=row.get('engine'),
-                        vehicle_display_name=f"{make.make_name} {model.model_name} {row.get('year')}"
-                    )
-                    
-                    # Handle Image URL
-                    if 'image_url' in row and row['image_url']:
-                        VehicleImage.objects.create(vehicle=vehicle, image_url=row['image_url'], is_primary=True)
-
-                    success_count += 1
-                except Exception as e:
-                    errors.append(f"Row {index}: {str(e)}")
+            # New makes or models change the reference catalog snapshot
+            if result.makes_created or result.models_created:
+                build_snapshot()
 
             return Response({
                 'status': 'success',
-                'imported_count': success_count,
-                'errors': errors
+                'imported_count': result.imported,
+                'errors': result.errors,
+                'error_count': result.error_count,
+                'elapsed_seconds': round(result.elapsed, 3),
+                'rows_per_second': result.rows_per_second,
             })
 
         except Exception as e:
             return Response({'error': f'Error processing file: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
+class ImportJobListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_staff:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        jobs = ImportJob.objects.order_by('-created_at')[:50]
+        return Response(ImportJobSerializer(jobs, many=True).data)
+
+class ImportJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        if not request.user.is_staff:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            job = ImportJob.objects.get(pk=pk)
+        except ImportJob.DoesNotExist:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        data = ImportJobSerializer(job).data
+        # A running job that is not in this process's pool was interrupted
+        data['active'] = is_active(job.pk)
+        return Response(data)
+
+class ImportJobResumeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        if not request.user.is_staff:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            job = ImportJob.objects.get(pk=pk)
+        except ImportJob.DoesNotExist:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if job.status == ImportJob.STATUS_COMPLETED:
+            return Response({'error': 'Import job already completed'}, status=status.HTTP_400_BAD_REQUEST)
+        # run_job() claims the job in the database, which settles any race with this check
+        if is_running_elsewhere(job) or not submit_job(job):
+            return Response({'error': 'Import job is already running'}, status=status.HTTP_409_CONFLICT)
+
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class VehicleExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    # `format` is taken by DRF's content negotiation, hence `output`
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+    }
+
+    def get(self, request):
+        if not request.user.is_staff:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        output = request.query_params.get('output', 'csv')
+        if output not in self.content_types:
+            return Response({'error': 'output must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same filters as /api/vehicles/
+        queryset = export_queryset(request.query_params)
+        stream = stream_csv(queryset) if output == 'csv' else stream_ndjson(queryset)
+        response = StreamingHttpResponse(stream, content_type=self.content_types[output])
+        filename = f"vehicles_{timezone.now():%Y%m%d_%H%M%S}.{output}"
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+
 class VehicleUploadTemplateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -524,8 +694,9 @@ class VehicleUploadTemplateView(APIView):
             
         return response
 
-class HomepageFeatureView(APIView):
+class HomepageFeatureView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    etag_models = (HomepageFeature,)
 
     def get(self, request):
         features = HomepageFeature.objects.all()
@@ -559,17 +730,30 @@ class HomepageFeatureView(APIView):
                 
         return Response(created_features, status=status.HTTP_201_CREATED)
 
-class VehicleRetrieveView(generics.RetrieveAPIView):
-    queryset = VehicleDetail.objects.all()
+class VehicleRetrieveView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = VehicleDetailSerializer
+    # Names shown on the detail page; the vehicle's own rows are covered by its version
+    etag_models = (Make, MakeModel, Body, DriveType)
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        # Increment view count
-        metadata, created = VehicleMetadata.objects.get_or_create(vehicle=instance)
-        metadata.views_count += 1
-        metadata.save()
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+    def get_etag_parts(self, request, *args, **kwargs):
+        return [vehicle_version(kwargs['pk'])] + super().get_etag_parts(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        # Counted once the vehicle has been found, so ids that 404 are never buffered
+        response = super().get(request, *args, **kwargs)
+        self.record_view(kwargs['pk'])
+        return response
+
+    def not_modified(self, request, *args, **kwargs):
+        # Revisits answered with 304 count too. The ETag came from an earlier
+        # 200 for this vehicle, and deleting it bumps its version.
+        self.record_view(kwargs['pk'])
 
+    def record_view(self, pk):
+        # Buffered in memory and merged in batches (see api/analytics.py)
+        view_count_buffer.record(pk)
+
+    def get_queryset(self):
+        return VehicleDetailSerializer.setup_eager_loading(
+            VehicleDetail.objects.all(), self.request.query_params
+        )
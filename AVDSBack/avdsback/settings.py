@@ -103,6 +103,89 @@ DATABASES = {
 # }
 
 
+# Cache used for catalog responses (facets, vehicle lists, reference data).
+# LocMemCache is per process; point this at a shared backend such as Redis or
+# Memcached when running several workers so invalidations reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'avds-catalog',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Search analytics are buffered in memory and written in batches
+SEARCH_ANALYTICS_FLUSH_INTERVAL = 5  # seconds
+SEARCH_ANALYTICS_FLUSH_SIZE = 200  # pending searches that trigger an early flush
+
+# Vehicle detail view counts are buffered the same way
+VIEW_COUNT_FLUSH_INTERVAL = 5  # seconds
+VIEW_COUNT_FLUSH_SIZE = 500  # pending views that trigger an early flush
+
+# Admin dashboard figures are precomputed (see api/stats.py); a dashboard load
+# triggers a background recount once they are older than this
+ADMIN_STATS_MAX_AGE = 300  # seconds
+
+# Rows per transaction for CSV vehicle imports
+VEHICLE_IMPORT_CHUNK_SIZE = 1000
+
+# Uploads at least this large (bytes) run as background import jobs
+VEHICLE_IMPORT_BACKGROUND_THRESHOLD = 2 * 1024 * 1024
+IMPORT_WORKERS = 1  # import jobs run one at a time
+IMPORT_JOB_STALE_AFTER = 120  # seconds without a checkpoint before a running job can be resumed
+
+# Widths (px) of the JPEG/WebP copies rendered for uploaded vehicle images
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+# Width list and favorites cards link by default (?image_width= overrides it)
+IMAGE_CARD_WIDTH = 320
+IMAGE_WORKERS = 2
+
+# Remote image_url images are downloaded into MEDIA_ROOT (see api/remote_images.py)
+REMOTE_IMAGE_CACHE = True
+REMOTE_IMAGE_WORKERS = 8
+REMOTE_IMAGE_TIMEOUT = (3.05, 10)  # connect, read (seconds)
+REMOTE_IMAGE_RETRIES = 2
+REMOTE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+# Ollama chat backend (see api/llm.py)
+OLLAMA_URL = 'http://localhost:11434'
+OLLAMA_MODEL = 'gpt-oss:20b-cloud'
+OLLAMA_TIMEOUT = (3.05, 120)  # connect, read (seconds); read is per chunk when streaming
+OLLAMA_POOL_SIZE = 10  # keep-alive connections
+
+# Chat replies are cached per normalized prompt (see api/chat.py) in their own cache
+CHAT_CACHE_TTL = 3600  # seconds
+CHAT_CACHE_MAX_ENTRIES = 1000
+CACHES['chat'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'avds-chat',
+    'TIMEOUT': CHAT_CACHE_TTL,
+    # Culling MAX_ENTRIES // CULL_FREQUENCY = 1 entry at a time makes eviction strict LRU
+    'OPTIONS': {'MAX_ENTRIES': CHAT_CACHE_MAX_ENTRIES, 'CULL_FREQUENCY': CHAT_CACHE_MAX_ENTRIES},
+}
+
+# Chat messages are grounded with up to CHAT_CONTEXT_VEHICLES matching
+# vehicles, packed into at most CHAT_CONTEXT_TOKENS tokens (see api/retrieval.py)
+CHAT_CATALOG_CONTEXT = True
+CHAT_CONTEXT_VEHICLES = 8
+CHAT_CONTEXT_TOKENS = 400
+
+# Server-side chat sessions send the newest turns within CHAT_HISTORY_TOKENS
+# and fold older ones into a summary of at most CHAT_SUMMARY_TOKENS
+CHAT_HISTORY_TOKENS = 1500
+CHAT_SUMMARY_TOKENS = 300
+
+# AsyncChatView (ASGI) admits at most CHAT_MAX_IN_FLIGHT LLM calls per worker
+# and queues up to CHAT_MAX_QUEUE more for CHAT_QUEUE_TIMEOUT seconds; beyond
+# that it answers 429/503 with Retry-After: CHAT_RETRY_AFTER (see api/chat.py)
+CHAT_MAX_IN_FLIGHT = 8
+CHAT_MAX_QUEUE = 32
+CHAT_QUEUE_TIMEOUT = 10  # seconds
+CHAT_RETRY_AFTER = 5  # seconds
+
+# The in-memory typeahead index is rebuilt after this many seconds
+SUGGESTIONS_MAX_AGE = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -142,6 +225,9 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Precomputed reference catalog served by /api/catalog/
+CATALOG_SNAPSHOT_DIR = os.path.join(MEDIA_ROOT, 'catalog')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 